@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, make_response
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, make_response, Response, send_file
 import sqlite3
 import smtplib
 import os
@@ -6,6 +6,10 @@ import hashlib
 import secrets
 import string
 import random
+import tempfile
+import io
+import shutil
+import binascii
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
@@ -13,15 +17,37 @@ from sentence_transformers import SentenceTransformer
 import numpy as np
 import re
 import base64
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from functools import wraps
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
+from PIL import Image, ImageOps
+from werkzeug.exceptions import RequestEntityTooLarge
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock; see lock_embedding_sidecar
+    fcntl = None
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
+# Largest request body accepted; multipart image files past 500 KB are spooled to a temporary file
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv("MAX_UPLOAD_MB", "16")) * 1024 * 1024
+
+@app.errorhandler(413)
+def request_too_large(error):
+    """Reject oversized uploads with the usual JSON error"""
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'success': False, 'message': f'Upload is too large (limit is {limit_mb} MB)'}), 413
 
 # Add CORS headers
 @app.after_request
@@ -41,25 +67,195 @@ EMAIL_CONFIGURED = EMAIL_ADDRESS and EMAIL_PASSWORD
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "").strip()
 GOOGLE_CONFIGURED = bool(GOOGLE_CLIENT_ID and GOOGLE_CLIENT_ID != "")
 
+# Model that produced the stored embeddings before they were tagged with one
+DEFAULT_EMBEDDING_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+# Configured model; when it differs from the active one, reports are re-indexed and then switched over
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL).strip()
+# How often workers look for a model switch made by another process
+EMBEDDING_MODEL_CHECK_SECONDS = float(os.getenv("EMBEDDING_MODEL_CHECK_SECONDS", "10"))
+
+# Embedding backend: "torch" runs the sentence-transformers model, "onnx" runs a
+# locally exported ONNX copy of it (see export_onnx_model.py) with ONNX Runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_model")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model.onnx")
+
+class OnnxEmbeddingModel:
+    """ONNX Runtime stand-in for SentenceTransformer with the same encode() behaviour
+    
+    Tokenizer and model are loaded from a local directory. Token embeddings are
+    mean-pooled over the attention mask, as the original model's pooling layer does.
+    """
+    
+    def __init__(self, model_dir, model_file, max_length=128):
+        # Optional dependency, only needed for this backend
+        import onnxruntime
+        from transformers import AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.max_length = max_length
+    
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors='np')
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            token_embeddings = self.session.run(None, feeds)[0]
+            mask = tokens['attention_mask'][..., np.newaxis].astype(np.float32)
+            batches.append((token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        
+        embeddings = np.vstack(batches).astype(np.float32) if batches else np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+    
+    def get_sentence_embedding_dimension(self):
+        return self.session.get_outputs()[0].shape[-1]
+
 # Initialize NLP model
-def load_nlp_model():
+def load_nlp_model(model_name=None):
     # Use a smaller model for efficiency - this is a multilingual model that works well for English and many other languages
+    model_name = model_name or EMBEDDING_MODEL
     try:
-        model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        # The ONNX export is of the configured model
+        if EMBEDDING_BACKEND == "onnx" and model_name == EMBEDDING_MODEL:
+            return OnnxEmbeddingModel(ONNX_MODEL_DIR, ONNX_MODEL_FILE)
+        model = SentenceTransformer(model_name)
         return model
     except Exception as e:
         print(f"Warning: Could not load AI model: {e}")
         return None
 
-# Global model variable
+# Every report has two embedding slots of (vector, dtype, model) columns. The
+# active model's vectors live in the slot app_meta names and a re-index stages
+# the next model's vectors in the other, so switching models only flips the
+# pointer and workers still on the old model keep reading their own slot.
+EMBEDDING_SLOTS = {
+    'embedding': ('embedding', 'embedding_dtype', 'embedding_model'),
+    'embedding_next': ('embedding_next', 'embedding_next_dtype', 'embedding_next_model')
+}
+
+def other_embedding_slot(slot):
+    """Return the slot a re-index stages into while slot is active"""
+    return 'embedding_next' if slot == 'embedding' else 'embedding'
+
+def get_active_embedding():
+    """Return the model whose embeddings searches currently use and the slot holding them, read together"""
+    try:
+        conn = sqlite3.connect("lost_found.db")
+        cursor = conn.cursor()
+        cursor.execute("SELECT key, value FROM app_meta WHERE key IN ('embedding_model', 'embedding_slot')")
+        meta = dict(cursor.fetchall())
+        conn.close()
+    except sqlite3.OperationalError:
+        # Database not initialized yet
+        return EMBEDDING_MODEL, 'embedding'
+    return meta.get('embedding_model', EMBEDDING_MODEL), meta.get('embedding_slot', 'embedding')
+
+def get_active_embedding_model():
+    """Return the model whose embeddings searches currently use"""
+    return get_active_embedding()[0]
+
+# Global model variable, guarded so concurrent first requests load it only once
 nlp_model = None
+nlp_model_version = None
+nlp_model_slot = 'embedding'
+nlp_model_state = "not_loaded"  # not_loaded -> loading -> ready | failed
+nlp_model_lock = threading.Lock()
+nlp_model_checked_at = 0.0
+nlp_model_switch = None
+# Preloading starts with python app.py or on a process's first request, never at import
+NLP_MODEL_PRELOAD = os.getenv("NLP_MODEL_PRELOAD", "1") == "1"
+model_loading_thread = None
+model_loading_lock = threading.Lock()
+process_tasks_started = False
+process_tasks_lock = threading.Lock()
 
 def get_nlp_model():
-    global nlp_model
-    if nlp_model is None:
-        nlp_model = load_nlp_model()
+    """Return the shared model for the active embedding version, loading and warming it up on first use"""
+    global nlp_model, nlp_model_version, nlp_model_slot, nlp_model_state
+    if nlp_model is not None:
+        return nlp_model
+    with nlp_model_lock:
+        if nlp_model is None:
+            nlp_model_state = "loading"
+            version, slot = get_active_embedding()
+            model = load_nlp_model(version)
+            if model is None:
+                nlp_model_state = "failed"
+                return None
+            # The first encode initializes lazy kernels and buffers
+            model.encode("warmup")
+            nlp_model_version = version
+            nlp_model_slot = slot
+            nlp_model = model
+            nlp_model_state = "ready"
     return nlp_model
 
+def activate_embedding_model(version, model, slot):
+    """Serve a newly activated model from its embedding slot, dropping everything derived from the previous one"""
+    global nlp_model, nlp_model_version, nlp_model_slot, embedding_index
+    with embedding_index_lock:
+        with nlp_model_lock:
+            nlp_model = model
+            nlp_model_version = version
+            nlp_model_slot = slot
+        embedding_index = None
+    with embedding_cache_lock:
+        embedding_cache.clear()
+    invalidate_search_cache()
+
+def check_embedding_model_switch():
+    """Load the active model in the background if another process has switched to it"""
+    global nlp_model_checked_at, nlp_model_switch
+    now = time.monotonic()
+    if nlp_model is None or now - nlp_model_checked_at < EMBEDDING_MODEL_CHECK_SECONDS:
+        return
+    nlp_model_checked_at = now
+    version, slot = get_active_embedding()
+    if (version, slot) == (nlp_model_version, nlp_model_slot) or (nlp_model_switch is not None and nlp_model_switch.is_alive()):
+        return
+    
+    def run():
+        # The old model keeps serving from its own slot until the new one is warmed up
+        model = load_nlp_model(version)
+        if model is None:
+            return
+        model.encode("warmup")
+        activate_embedding_model(version, model, slot)
+        get_embedding_index()
+        # Re-embed anything this worker wrote with the old model in the meantime
+        backfill_embeddings()
+    
+    nlp_model_switch = threading.Thread(target=run, daemon=True)
+    nlp_model_switch.start()
+
+def start_model_loading():
+    """Load the model and embedding index in a background thread so no request waits for them
+    
+    Only the first call in a process starts the thread, so it is safe from
+    both python app.py and the per-process request hook.
+    """
+    global model_loading_thread
+    def run():
+        if get_nlp_model() is None:
+            return
+        try:
+            get_embedding_index()
+        except sqlite3.Error as e:
+            # The database may not be initialized yet; the index is built on first use instead
+            print(f"Warning: Could not preload embedding index: {e}")
+    
+    with model_loading_lock:
+        if model_loading_thread is None:
+            model_loading_thread = threading.Thread(target=run, daemon=True)
+            model_loading_thread.start()
+    return model_loading_thread
+
 # ------------------- DB Setup -------------------
 def add_column_if_missing(column_name, column_def):
     conn = sqlite3.connect("lost_found.db")
@@ -119,6 +315,103 @@ def init_db():
     add_column_if_missing("matched", "INTEGER DEFAULT 0")
     add_column_if_missing("image", "BLOB")
     add_column_if_missing("user_id", "INTEGER")
+    add_column_if_missing("embedding_dtype", "TEXT")
+    add_column_if_missing("embedding_model", "TEXT")
+    add_column_if_missing("embedding_next", "BLOB")
+    add_column_if_missing("embedding_next_dtype", "TEXT")
+    add_column_if_missing("embedding_next_model", "TEXT")
+    add_column_if_missing("brand", "TEXT")
+    add_column_if_missing("color", "TEXT")
+    add_column_if_missing("item_type", "TEXT")
+    add_column_if_missing("entity_version", "INTEGER")
+    add_column_if_missing("image_hash", "TEXT")
+    add_column_if_missing("image_status", "TEXT")
+    
+    # Key/value settings shared by all processes, e.g. the active embedding model
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS app_meta (key TEXT PRIMARY KEY, value TEXT)")
+    # Untagged embeddings were all produced by the original model
+    cursor.execute("UPDATE reports SET embedding_model = ? WHERE embedding IS NOT NULL AND embedding_model IS NULL", (DEFAULT_EMBEDDING_MODEL,))
+    cursor.execute("SELECT COUNT(*) FROM reports WHERE embedding IS NOT NULL")
+    active_model = DEFAULT_EMBEDDING_MODEL if cursor.fetchone()[0] else EMBEDDING_MODEL
+    cursor.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('embedding_model', ?)", (active_model,))
+    cursor.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('embedding_slot', 'embedding')")
+    # Vectors staged before the slots were tagged belong to the re-index target
+    cursor.execute("""
+        UPDATE reports SET embedding_next_model = (SELECT value FROM app_meta WHERE key = 'reindex_model')
+        WHERE embedding_next IS NOT NULL AND embedding_next_model IS NULL
+    """)
+    # Bumped on every change that can alter search results, see cached_hybrid_search
+    cursor.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('data_generation', '0')")
+    bump_generation = "UPDATE app_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'data_generation';"
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS reports_generation_insert AFTER INSERT ON reports BEGIN {bump_generation} END")
+    cursor.execute(f"CREATE TRIGGER IF NOT EXISTS reports_generation_delete AFTER DELETE ON reports BEGIN {bump_generation} END")
+    # Recreated because older databases also fired on embedding writes, see the slot triggers below
+    cursor.execute("DROP TRIGGER IF EXISTS reports_generation_update")
+    cursor.execute(f"""
+        CREATE TRIGGER reports_generation_update
+        AFTER UPDATE OF name, contact, description, status, resolved, secret, category, image ON reports
+        BEGIN {bump_generation} END
+    """)
+    # Reports whose indexed fields changed, so every worker process can refresh its embedding index
+    cursor.execute("CREATE TABLE IF NOT EXISTS report_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, report_id INTEGER NOT NULL)")
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS reports_changes_insert AFTER INSERT ON reports BEGIN INSERT INTO report_changes (report_id) VALUES (new.id); END")
+    cursor.execute("CREATE TRIGGER IF NOT EXISTS reports_changes_delete AFTER DELETE ON reports BEGIN INSERT INTO report_changes (report_id) VALUES (old.id); END")
+    cursor.execute("DROP TRIGGER IF EXISTS reports_changes_update")
+    cursor.execute("""
+        CREATE TRIGGER reports_changes_update
+        AFTER UPDATE OF status, resolved, category, brand, color, item_type, entity_version ON reports
+        BEGIN INSERT INTO report_changes (report_id) VALUES (new.id); END
+    """)
+    # Embedding writes only count in the active slot; staging a re-index into the other one changes no results
+    for slot, (vector_column, _, model_column) in EMBEDDING_SLOTS.items():
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS reports_{slot}_update
+            AFTER UPDATE OF {vector_column}, {model_column} ON reports
+            WHEN (SELECT value FROM app_meta WHERE key = 'embedding_slot') = '{slot}'
+            BEGIN {bump_generation} INSERT INTO report_changes (report_id) VALUES (new.id); END
+        """)
+    # Newest-first listings, overall and per status, for the lost/found/all searches
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports (timestamp DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_status_timestamp ON reports (status, timestamp DESC, id DESC)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_entities ON reports (item_type, brand, color)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_image_hash ON reports (image_hash)")
+    # One row per matched Lost/Found pair with the score it was matched at
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS matches (
+            lost_id INTEGER NOT NULL,
+            found_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            components TEXT,
+            created_at TEXT NOT NULL,
+            notified_at TEXT,
+            PRIMARY KEY (lost_id, found_id)
+        )
+    """)
+    try:
+        # Pairs stored before notifications were tracked were all emailed when found
+        cursor.execute("ALTER TABLE matches ADD COLUMN notified_at TEXT")
+        cursor.execute("UPDATE matches SET notified_at = created_at")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        # Each side is stamped once its own email went out, notified_at once both have
+        cursor.execute("ALTER TABLE matches ADD COLUMN lost_notified_at TEXT")
+        cursor.execute("ALTER TABLE matches ADD COLUMN found_notified_at TEXT")
+        cursor.execute("UPDATE matches SET lost_notified_at = notified_at, found_notified_at = notified_at")
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_matches_found ON matches (found_id)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_matches_delete AFTER DELETE ON reports BEGIN
+            DELETE FROM matches WHERE lost_id = old.id OR found_id = old.id;
+        END
+    """)
+    conn.commit()
+    conn.close()
+    create_search_index()
+    create_image_index()
     
     # Add reset token columns to users table
     conn = sqlite3.connect("lost_found.db")
@@ -162,6 +455,101 @@ def init_db():
         pass
     conn.close()
 
+def create_search_index():
+    """Create the FTS5 full-text index over report descriptions and categories
+    
+    It uses reports as external content and is kept current by triggers.
+    """
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'reports_fts'")
+    exists = cursor.fetchone() is not None
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts
+            USING fts5(description, category, content='reports', content_rowid='id')
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search stays semantic-only
+        print(f"Warning: Could not create full-text search index: {e}")
+        conn.close()
+        return
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN
+            INSERT INTO reports_fts (rowid, description, category) VALUES (new.id, new.description, new.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN
+            INSERT INTO reports_fts (reports_fts, rowid, description, category) VALUES ('delete', old.id, old.description, old.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF description, category ON reports BEGIN
+            INSERT INTO reports_fts (reports_fts, rowid, description, category) VALUES ('delete', old.id, old.description, old.category);
+            INSERT INTO reports_fts (rowid, description, category) VALUES (new.id, new.description, new.category);
+        END
+    """)
+    if not exists:
+        # Index the reports written before the table existed
+        cursor.execute("INSERT INTO reports_fts (reports_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+
+def create_image_index():
+    """Create the stored image table with its reference counts and the perceptual hash band index
+    
+    Reference counts follow reports.image_hash through triggers, so every path
+    that attaches, replaces or deletes an image keeps them current.
+    """
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'images'")
+    exists = cursor.fetchone() is not None
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            phash INTEGER,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT
+        )
+    """)
+    # One row per 16-bit band of each perceptual hash, see find_duplicate_images
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS image_phash_bands (
+            band_key INTEGER NOT NULL,
+            image_hash TEXT NOT NULL,
+            PRIMARY KEY (band_key, image_hash)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_images_insert AFTER INSERT ON reports WHEN new.image_hash IS NOT NULL BEGIN
+            INSERT INTO images (hash, refcount) VALUES (new.image_hash, 1)
+            ON CONFLICT (hash) DO UPDATE SET refcount = refcount + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_images_delete AFTER DELETE ON reports WHEN old.image_hash IS NOT NULL BEGIN
+            UPDATE images SET refcount = refcount - 1 WHERE hash = old.image_hash;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS reports_images_update AFTER UPDATE OF image_hash ON reports
+        WHEN old.image_hash IS NOT new.image_hash BEGIN
+            UPDATE images SET refcount = refcount - 1 WHERE hash = old.image_hash;
+            INSERT INTO images (hash, refcount) SELECT new.image_hash, 1 WHERE new.image_hash IS NOT NULL
+            ON CONFLICT (hash) DO UPDATE SET refcount = refcount + 1;
+        END
+    """)
+    if not exists:
+        # Count the images attached before the table existed, their perceptual hashes are filled in by migrate_images.py
+        cursor.execute("""
+            INSERT INTO images (hash, refcount)
+            SELECT image_hash, COUNT(*) FROM reports WHERE image_hash IS NOT NULL GROUP BY image_hash
+        """)
+    conn.commit()
+    conn.close()
+
 # ------------------- Email Templates -------------------
 def create_lost_item_found_email(name, match_description, finder_name, finder_contact):
     """Create a simple single card email template for when a lost item is found"""
@@ -831,15 +1219,143 @@ def send_email(to_email, subject, body, is_html=False):
         return False
 
 # ------------------- NLP Functions -------------------
+# LRU cache of embeddings keyed on normalized text, so repeated searches skip inference
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "16")) * 1024 * 1024
+
+embedding_cache = OrderedDict()
+embedding_cache_bytes = 0
+embedding_cache_hits = 0
+embedding_cache_misses = 0
+embedding_cache_lock = threading.Lock()
+
+def normalize_text(text):
+    """Lowercase text and collapse whitespace"""
+    return ' '.join(text.lower().split())
+
+def cache_embedding(text, embedding):
+    """Store an embedding in the LRU cache, evicting the oldest entries over the caps"""
+    global embedding_cache_bytes
+    # Cached arrays are shared between callers, so they must never be mutated
+    embedding.flags.writeable = False
+    with embedding_cache_lock:
+        if text in embedding_cache:
+            embedding_cache_bytes -= embedding_cache.pop(text).nbytes
+        embedding_cache[text] = embedding
+        embedding_cache_bytes += embedding.nbytes
+        while embedding_cache and (len(embedding_cache) > EMBEDDING_CACHE_SIZE or embedding_cache_bytes > EMBEDDING_CACHE_MAX_BYTES):
+            _, evicted = embedding_cache.popitem(last=False)
+            embedding_cache_bytes -= evicted.nbytes
+
+def get_embedding_cache_stats():
+    """Return hit/miss counters and occupancy of the embedding cache"""
+    with embedding_cache_lock:
+        lookups = embedding_cache_hits + embedding_cache_misses
+        return {
+            'hits': embedding_cache_hits,
+            'misses': embedding_cache_misses,
+            'hit_rate': round(embedding_cache_hits / lookups, 4) if lookups else 0.0,
+            'entries': len(embedding_cache),
+            'max_entries': EMBEDDING_CACHE_SIZE,
+            'bytes': embedding_cache_bytes,
+            'max_bytes': EMBEDDING_CACHE_MAX_BYTES
+        }
+
+# Micro-batching: concurrent generate_embedding calls are collected for up to
+# EMBEDDING_BATCH_MAX_WAIT_MS and encoded by the model as a single batch
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+# A request gives up on its embedding after this long instead of hanging
+EMBEDDING_ENCODE_TIMEOUT = float(os.getenv("EMBEDDING_ENCODE_TIMEOUT_SECONDS", "30"))
+
+embedding_queue = queue.Queue()
+embedding_worker = None
+embedding_worker_lock = threading.Lock()
+
+def collect_embedding_batch():
+    """Block for the next pending request, then gather more until the batch is full or the wait expires"""
+    batch = [embedding_queue.get()]
+    deadline = time.monotonic() + EMBEDDING_BATCH_MAX_WAIT_MS / 1000
+    while len(batch) < EMBEDDING_BATCH_MAX_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(embedding_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+def run_embedding_worker():
+    """Encode queued texts in batches and hand each result back to its waiting request"""
+    while True:
+        # Requests that timed out before being picked up are skipped
+        batch = [(text, future) for text, future in collect_embedding_batch() if future.set_running_or_notify_cancel()]
+        if not batch:
+            continue
+        # Identical texts in one batch are encoded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            model = get_nlp_model()
+            if model is None:
+                vectors = {text: None for text in texts}
+            else:
+                encoded = model.encode(texts)
+                vectors = {text: np.array(encoded[i]) for i, text in enumerate(texts)}
+            for text, future in batch:
+                future.set_result(vectors[text])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+
+def start_embedding_worker():
+    """Start the batching worker thread, or a new one if it has died, e.g. in a forked process"""
+    global embedding_worker
+    with embedding_worker_lock:
+        if embedding_worker is None or not embedding_worker.is_alive():
+            embedding_worker = threading.Thread(target=run_embedding_worker, daemon=True)
+            embedding_worker.start()
+
+def encode_text(text):
+    """Encode one text through the micro-batching scheduler
+    
+    Raises TimeoutError when no embedding arrives within EMBEDDING_ENCODE_TIMEOUT_SECONDS.
+    """
+    # Loaded here, so the timeout only covers the encoding itself
+    model = get_nlp_model()
+    if model is None:
+        return None
+    if EMBEDDING_BATCH_MAX_SIZE <= 1:
+        return model.encode(text)
+    
+    if embedding_worker is None or not embedding_worker.is_alive():
+        start_embedding_worker()
+    
+    future = Future()
+    embedding_queue.put((text, future))
+    try:
+        return future.result(timeout=EMBEDDING_ENCODE_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError("The AI model did not respond in time, please try again") from None
+
 def generate_embedding(text):
     """Convert text to embedding vector using the sentence transformer model"""
+    global embedding_cache_hits, embedding_cache_misses
     # Clean and preprocess text
-    text = text.lower().strip()
+    text = normalize_text(text)
+    with embedding_cache_lock:
+        embedding = embedding_cache.get(text)
+        if embedding is not None:
+            embedding_cache.move_to_end(text)
+            embedding_cache_hits += 1
+            return embedding
+        embedding_cache_misses += 1
     # Generate embedding
-    model = get_nlp_model()
-    if model is None:
+    embedding = encode_text(text)
+    if embedding is None:
         return None
-    embedding = model.encode(text)
+    cache_embedding(text, embedding)
     return embedding
 
 def compute_similarity(embedding1, embedding2):
@@ -849,229 +1365,2168 @@ def compute_similarity(embedding1, embedding2):
     similarity = np.dot(embedding1_norm, embedding2_norm)
     return float(similarity * 100)
 
-def extract_entities(text):
-    """Extract key entities from text using regex patterns"""
+# ------------------- Entity Extraction -------------------
+# Brand, color, item-type and category keywords live in a JSON vocabulary and
+# are compiled into one trie-shaped regex, so a description is scanned once
+# for every keyword instead of once per keyword.
+ENTITY_VOCABULARY_PATH = os.getenv("ENTITY_VOCABULARY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "entity_vocabulary.json"))
+WORD_CHAR = re.compile(r'\w')
+
+def build_trie_pattern(keywords):
+    """Build a regex matching the longest keyword that starts at a position, branching like a trie"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def to_pattern(node):
+        branches = [re.escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A keyword ends here, so the longer continuations are optional
+        return f'(?:{pattern})?' if '' in node else pattern
+    
+    return to_pattern(trie)
+
+def load_entity_vocabulary(path):
+    """Load the keyword vocabulary and compile the single-pass keyword scanner"""
+    with open(path, encoding='utf-8') as f:
+        vocabulary = json.load(f)
+    keywords = set(vocabulary['brands']) | set(vocabulary['colors'])
+    for group in ('item_types', 'categories'):
+        for group_keywords in vocabulary[group].values():
+            keywords.update(group_keywords)
+    # The lookahead reports the longest keyword at every position, overlapping ones included
+    vocabulary['pattern'] = re.compile('(?=(' + build_trie_pattern(keywords) + '))')
+    # Shorter keywords starting at the same position are prefixes of the longest one
+    vocabulary['prefixes'] = {keyword: [other for other in keywords if keyword.startswith(other)] for keyword in keywords}
+    return vocabulary
+
+entity_vocabulary = load_entity_vocabulary(ENTITY_VOCABULARY_PATH)
+
+def is_word_boundary(text, position):
+    """Whether regex \\b holds at position in text"""
+    before = position > 0 and WORD_CHAR.match(text, position - 1) is not None
+    after = position < len(text) and WORD_CHAR.match(text, position) is not None
+    return before != after
+
+def scan_keywords(text):
+    """Find every vocabulary keyword in lowercase text in one pass
+    
+    Returns (substring hits, whole-word hits) as sets of keywords.
+    """
+    substrings = set()
+    words = set()
+    for match in entity_vocabulary['pattern'].finditer(text):
+        start = match.start()
+        starts_word = is_word_boundary(text, start)
+        for keyword in entity_vocabulary['prefixes'][match.group(1)]:
+            substrings.add(keyword)
+            if starts_word and is_word_boundary(text, start + len(keyword)):
+                words.add(keyword)
+    return substrings, words
+
+def entities_from_hits(words):
+    """Pick brand, color and item type from whole-word hits, earlier vocabulary entries first"""
     entities = {}
     
-    # Brand detection
-    brands = ["apple", "samsung", "sony", "nokia", "oppo", "vivo", "xiaomi", 
-              "realme", "dell", "hp", "lenovo", "asus", "acer", "huawei"]
+    for brand in entity_vocabulary['brands']:
+        if brand in words:
+            entities["brand"] = brand
+            break
+    
+    for color in entity_vocabulary['colors']:
+        if color in words:
+            entities["color"] = color
+            break
+    
+    for item_type, keywords in entity_vocabulary['item_types'].items():
+        if any(keyword in words for keyword in keywords):
+            entities["item_type"] = item_type
+            break
+    
+    return entities
+
+def category_from_hits(entities, substrings):
+    """Choose the category from the item type, or else the category with the most keyword hits"""
+    if "item_type" in entities:
+        item_type = entities["item_type"]
+        if item_type == "charger" and "phone" in substrings:
+            return "phone charger"
+        return item_type
+    
+    best_category = "other"
+    best_score = 0
+    
+    for category, keywords in entity_vocabulary['categories'].items():
+        score = sum(1 for keyword in keywords if keyword in substrings)
+        if score > best_score:
+            best_score = score
+            best_category = category
+    
+    if best_category == "charger" and any(device in substrings for device in entity_vocabulary['categories']["phone"]):
+        return "phone charger"
+    
+    return best_category
+
+def analyze_description(description):
+    """Return (category, entities) for a description from a single scan"""
+    substrings, words = scan_keywords(description.lower())
+    entities = entities_from_hits(words)
+    return category_from_hits(entities, substrings), entities
+
+def extract_entities(text):
+    """Extract key entities from text using the compiled keyword scanner"""
+    _, words = scan_keywords(text.lower())
+    return entities_from_hits(words)
+
+def detect_item_category(description):
+    """Extract the likely category of the item from its description using NLP"""
+    return analyze_description(description)[0]
+
+# Bump when extract_entities changes so stored entities are extracted again
+ENTITY_VERSION = 1
+
+def extract_entity_columns(description):
+    """Return the (brand, color, item_type) columns stored for a description"""
+    entities = extract_entities(description)
+    return entities.get("brand"), entities.get("color"), entities.get("item_type")
+
+def backfill_entities(batch_size=500):
+    """Store extracted entities for reports written before they were persisted, returning the count"""
+    total = 0
+    while True:
+        conn = sqlite3.connect("lost_found.db")
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, description FROM reports WHERE entity_version IS NOT ? LIMIT ?", (ENTITY_VERSION, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            conn.close()
+            break
+        cursor.executemany("UPDATE reports SET brand = ?, color = ?, item_type = ?, entity_version = ? WHERE id = ?",
+                           [extract_entity_columns(description) + (ENTITY_VERSION, report_id) for report_id, description in rows])
+        conn.commit()
+        conn.close()
+        total += len(rows)
+    return total
+
+# ------------------- Embedding Storage -------------------
+# Embeddings are stored as float32 or float16 BLOBs; embedding_dtype records
+# which, with NULL meaning float32 for rows written before the column existed
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32").strip().lower()
+EMBEDDING_DTYPES = {'float32': np.float32, 'float16': np.float16}
+
+def embedding_columns(slot=None):
+    """Return the (vector, dtype, model) columns of a slot, by default the one the serving model reads"""
+    return EMBEDDING_SLOTS[slot or nlp_model_slot]
+
+def embedding_size_sql(slot=None):
+    """SQL expression for the number of vector components in a stored BLOB, whatever its dtype"""
+    vector_column, dtype_column, _ = embedding_columns(slot)
+    return f"length({vector_column}) / (CASE {dtype_column} WHEN 'float16' THEN 2 ELSE 4 END)"
+
+def encode_embedding(embedding):
+    """Serialize an embedding for storage, returning (blob, dtype name)"""
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPES[EMBEDDING_STORAGE_DTYPE]).tobytes(), EMBEDDING_STORAGE_DTYPE
+
+def current_embedding_sql():
+    """Return the SQL condition and parameters selecting embeddings made by the serving model"""
+    dimension = get_embedding_dimension()
+    vector_column, _, model_column = embedding_columns()
+    return (f"{vector_column} IS NOT NULL AND {model_column} = ? AND {embedding_size_sql()} = ?",
+            (nlp_model_version, dimension or 0))
+
+def decode_embedding(blob, dtype=None):
+    """Deserialize a stored embedding BLOB into a float32 vector"""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPES[dtype or 'float32']).astype(np.float32)
+
+def load_report_embeddings(report_ids):
+    """Read normalized full-precision embeddings for the given reports, keyed by report id"""
+    sidecar = open_embedding_sidecar()
+    if sidecar is not None:
+        return {report_id: np.array(sidecar[report_id]) for report_id in report_ids
+                if report_id < len(sidecar) and sidecar[report_id].any()}
+    return load_stored_embeddings(report_ids)
+
+def load_stored_embeddings(report_ids):
+    """Read normalized embeddings for the given reports from the reports table, keyed by report id"""
+    condition, params = current_embedding_sql()
+    vectors = {}
+    for start in range(0, len(report_ids), 500):
+        chunk = report_ids[start:start + 500]
+        for report_id, embedding_blob, embedding_dtype in select_reports('embedding', f"{condition} AND id IN ({','.join(['?'] * len(chunk))})", params + tuple(chunk)):
+            vectors[report_id] = normalize_embedding(decode_embedding(embedding_blob, embedding_dtype))
+    return vectors
+
+# ------------------- Embedding Sidecar -------------------
+# Optional memory-mapped .npy file holding every normalized report embedding,
+# one float32 row per report id (zero rows are absent). Worker processes map
+# the same file, so they share one page-cache copy and start without reading
+# BLOBs from SQLite. Writers serialize across processes on a file lock next to
+# the sidecar, never on SQLite's write lock, so report submissions never wait
+# for a rebuild.
+# Each embedding slot has its own file (the second one named e.g.
+# embeddings.next.npy), so workers on the old and new model never share one.
+EMBEDDING_SIDECAR_PATH = os.getenv("EMBEDDING_SIDECAR_PATH", "").strip()
+
+def get_sidecar_path(slot=None):
+    """Return the sidecar file of a slot, by default the one the serving model reads"""
+    if (slot or nlp_model_slot) == 'embedding':
+        return EMBEDDING_SIDECAR_PATH
+    root, extension = os.path.splitext(EMBEDDING_SIDECAR_PATH)
+    return f"{root}.next{extension}"
+
+def open_embedding_sidecar(mode='r'):
+    """Memory-map the sidecar file, or return None when it is disabled or missing"""
+    if not EMBEDDING_SIDECAR_PATH or not os.path.exists(get_sidecar_path()):
+        return None
+    return np.load(get_sidecar_path(), mmap_mode=mode)
+
+def get_sidecar_version():
+    """Identify the current sidecar file, which changes when it is replaced (rebuilt or grown)
+    
+    Rows written in place are seen by every mapping of the file and need no
+    new version; the report change log tells workers which rows to re-read.
+    """
+    try:
+        stat = os.stat(get_sidecar_path())
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size)
+
+sidecar_write_lock = threading.Lock()
+
+@contextmanager
+def lock_embedding_sidecar():
+    """Hold the sidecar's write lock: a thread lock in this process and a flock on a .lock file across processes
+    
+    The lock file is separate because rebuilds replace the sidecar itself.
+    Without fcntl (Windows, where servers run a single process) only the
+    thread lock is taken.
+    """
+    with sidecar_write_lock, open(get_sidecar_path() + '.lock', 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Closing the file releases the flock
+        yield
+
+def replace_embedding_sidecar(capacity, dimension, fill):
+    """Write a new sidecar of the given shape with fill(sidecar) and swap it in atomically
+    
+    Must be called with the sidecar lock held. The temporary file has a name
+    of its own, so an interrupted rebuild never clashes with the next one.
+    """
+    path = get_sidecar_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False) as f:
+        temp_path = f.name
+    try:
+        sidecar = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.float32, shape=(capacity, dimension))
+        fill(sidecar)
+        sidecar.flush()
+        del sidecar
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def write_sidecar_vectors(report_ids):
+    """Copy the stored embeddings of the given reports into the sidecar, clearing the rows of reports without one
+    
+    Called by the process that wrote the reports, after committing. The
+    embeddings are read while holding the sidecar lock, so whichever process
+    writes a row last, it ends up with the latest committed vector.
+    """
+    if not EMBEDDING_SIDECAR_PATH or not report_ids:
+        return
+    dimension = get_embedding_dimension()
+    with lock_embedding_sidecar():
+        sidecar = open_embedding_sidecar('r+')
+        if sidecar is None or sidecar.shape[1] != dimension:
+            # The rebuild reads these reports' vectors too
+            sidecar = None
+            rebuild_embedding_sidecar(dimension, force=True)
+            return
+        
+        vectors = dict.fromkeys(report_ids)
+        vectors.update(load_stored_embeddings(list(report_ids)))
+        
+        needed = max((report_id for report_id, vector in vectors.items() if vector is not None), default=-1) + 1
+        if needed > len(sidecar):
+            # Grow geometrically so appends stay amortized O(1)
+            source = sidecar
+            def copy_rows(grown):
+                grown[:len(source)] = source
+            replace_embedding_sidecar(max(needed, 2 * len(sidecar)), dimension, copy_rows)
+            source = sidecar = None
+            sidecar = open_embedding_sidecar('r+')
+        
+        for report_id, vector in vectors.items():
+            if report_id < len(sidecar):
+                sidecar[report_id] = vector if vector is not None else 0
+        sidecar.flush()
+
+def sync_embedding_sidecar(force=False):
+    """Rebuild the sidecar from the reports table when it is missing or out of step with it"""
+    if not EMBEDDING_SIDECAR_PATH:
+        return False
+    dimension = get_embedding_dimension()
+    if dimension is None:
+        return False
+    with lock_embedding_sidecar():
+        return rebuild_embedding_sidecar(dimension, force)
+
+def rebuild_embedding_sidecar(dimension, force=False, chunk_size=1000):
+    """Rebuild the sidecar unless it is in step with the reports table; the caller holds the sidecar lock
+    
+    Rows are read in short queries by id range rather than one long one, so
+    SQLite writers are never held up. A report written meanwhile is copied in
+    by its writer, which waits for the sidecar lock.
+    """
+    condition, params = current_embedding_sql()
+    conn = sqlite3.connect("lost_found.db")
+    stored_count, max_id = conn.execute(f"SELECT COUNT(*), MAX(id) FROM reports WHERE {condition}", params).fetchone()
+    conn.close()
+    
+    sidecar = open_embedding_sidecar()
+    if not force and sidecar is not None and sidecar.shape[1] == dimension:
+        present = sum(int(np.count_nonzero(sidecar[start:start + chunk_size].any(axis=1)))
+                      for start in range(0, len(sidecar), chunk_size))
+        if present == stored_count:
+            return False
+    sidecar = None
+    
+    def copy_rows(rebuilt):
+        last_id = -1
+        while True:
+            rows = list(select_reports('embedding', f"{condition} AND id > ?", params + (last_id,), order_by="id", limit=chunk_size))
+            if not rows:
+                break
+            for report_id, embedding_blob, embedding_dtype in rows:
+                if report_id < len(rebuilt):
+                    rebuilt[report_id] = normalize_embedding(decode_embedding(embedding_blob, embedding_dtype))
+            last_id = rows[-1].id
+    replace_embedding_sidecar(max(1024, 2 * ((max_id or 0) + 1)), dimension, copy_rows)
+    return True
+
+# ------------------- Embedding Index -------------------
+# Process-resident copy of every report embedding, pre-normalized into one
+# contiguous float32 matrix so a search is a single matrix-vector product.
+# Each worker process holds its own copy. Triggers log every report whose
+# indexed fields change in report_changes and bump the data generation; when
+# the generation has moved, get_embedding_index applies the logged reports to
+# this process's copy, whichever process wrote them.
+
+# Candidate generation for check_for_matches: "ivf" shortlists with an
+# inverted-file ANN index, "exact" scores every unresolved report
+MATCH_INDEX = os.getenv("MATCH_INDEX", "ivf").strip().lower()
+MATCH_SHORTLIST_SIZE = int(os.getenv("MATCH_SHORTLIST_SIZE", "200"))
+MATCH_IVF_NPROBE = int(os.getenv("MATCH_IVF_NPROBE", "8"))
+# Below this many reports clustering buys nothing, so the shortlist is exact
+MATCH_IVF_MIN_REPORTS = int(os.getenv("MATCH_IVF_MIN_REPORTS", "2000"))
+
+# The index matrix can be held as float16 or int8 (per-row scale) to cut its
+# footprint 2-4x; quantized scores only shortlist candidates, which are then
+# rescored with the full-precision vectors stored in the database
+EMBEDDING_INDEX_DTYPE = os.getenv("EMBEDDING_INDEX_DTYPE", "float32").strip().lower()
+EMBEDDING_RESCORE_FACTOR = int(os.getenv("EMBEDDING_RESCORE_FACTOR", "4"))
+# Quantized scores within this many points of a threshold are rescored before filtering
+EMBEDDING_QUANTIZATION_MARGIN = 2.0
+
+# Brand, color, item type and category of each indexed report, as integer
+# codes (0 = absent) in an (n, 4) array, so match bonuses are array compares
+entity_code_table = {}
+entity_code_lock = threading.Lock()
+
+embedding_index = None
+embedding_index_lock = threading.Lock()
+
+# Logged changes kept for workers that have not refreshed yet; one lagging further behind rebuilds its index
+REPORT_CHANGES_KEEP = 10000
+# A refresh touching more reports than this (or a tenth of the index) rebuilds instead
+INDEX_REFRESH_MAX_ROWS = 1000
+
+def normalize_embedding(embedding):
+    """Return a float32 unit-length copy of an embedding"""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(embedding)
+    if norm == 0:
+        return embedding
+    return embedding / norm
+
+def quantize_vectors(vectors):
+    """Convert normalized float32 rows to the index dtype, returning (matrix, per-row scales or None)"""
+    if EMBEDDING_INDEX_DTYPE == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, np.newaxis]).astype(np.int8), scales.astype(np.float32)
+    if EMBEDDING_INDEX_DTYPE == "float16":
+        return vectors.astype(np.float16), None
+    return vectors, None
+
+def dequantize_rows(index, rows):
+    """Return float32 approximations of the given index rows"""
+    vectors = index['matrix'][rows].astype(np.float32)
+    if index['scales'] is not None:
+        vectors *= index['scales'][rows][:, np.newaxis]
+    return vectors
+
+def scan_scores(index, query, rows, block_size=4096):
+    """Score the query against the given index rows (0-100), dequantizing in blocks to bound memory"""
+    if index['matrix'].dtype == np.float32:
+        return index['matrix'][rows] @ query * 100
+    if isinstance(rows, slice):
+        rows = np.arange(len(index['ids']))[rows]
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        block_scores = index['matrix'][block].astype(np.float32) @ query * 100
+        if index['scales'] is not None:
+            block_scores *= index['scales'][block]
+        scores[start:start + block_size] = block_scores
+    return scores
+
+def rescore_rows(index, query, rows):
+    """Score the query against the given index rows using full-precision stored vectors"""
+    vectors = load_report_embeddings([int(report_id) for report_id in index['ids'][rows]])
+    scores = scan_scores(index, query, rows)
+    for position, report_id in enumerate(index['ids'][rows]):
+        vector = vectors.get(int(report_id))
+        if vector is not None:
+            scores[position] = vector @ query * 100
+    return scores
+
+def train_ivf(matrix, iterations=10):
+    """Cluster normalized vectors with spherical k-means, returning (centroids, assignments)"""
+    n_lists = max(1, int(np.sqrt(len(matrix))))
+    rng = np.random.default_rng(0)
+    centroids = matrix[rng.choice(len(matrix), n_lists, replace=False)].copy()
+    
+    for _ in range(iterations):
+        assignments = assign_ivf_lists(matrix, centroids)
+        for list_id in range(n_lists):
+            members = matrix[assignments == list_id]
+            if len(members):
+                centroids[list_id] = normalize_embedding(members.sum(axis=0))
+            else:
+                # Re-seed empty lists so every centroid stays useful
+                centroids[list_id] = matrix[rng.integers(len(matrix))]
+    
+    return centroids, assign_ivf_lists(matrix, centroids)
+
+def assign_ivf_lists(matrix, centroids, block_size=4096):
+    """Return the nearest centroid for every row, in blocks to bound memory"""
+    assignments = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size]
+        assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def with_ivf(index, previous=None):
+    """Attach (or refresh) IVF lists on an index dict when the ANN backend is enabled
+    
+    Centroids from a previous index are reused until the corpus has doubled.
+    """
+    index['centroids'] = None
+    index['lists'] = None
+    index['trained_size'] = 0
+    size = int(np.count_nonzero(index['present']))
+    if MATCH_INDEX != "ivf" or index['matrix'] is None or size < MATCH_IVF_MIN_REPORTS:
+        return index
+    
+    if previous is not None and previous.get('centroids') is not None and size < 2 * previous['trained_size']:
+        index['centroids'] = previous['centroids']
+        index['trained_size'] = previous['trained_size']
+    else:
+        index['centroids'], _ = train_ivf(dequantize_rows(index, np.flatnonzero(index['present'])))
+        index['trained_size'] = size
+    index['lists'] = assign_index_lists(index, index['centroids'])
+    return index
+
+def assign_index_lists(index, centroids, block_size=4096):
+    """Return the nearest centroid for every index row, dequantizing one block at a time
+    
+    Over a mapped sidecar this reads the file in blocks instead of copying it
+    onto the heap.
+    """
+    lists = np.empty(len(index['ids']), dtype=np.int32)
+    for start in range(0, len(lists), block_size):
+        block = slice(start, start + block_size)
+        lists[block] = assign_ivf_lists(dequantize_rows(index, block), centroids)
+    return lists
+
+def entity_code(value):
+    """Return the integer code for an entity or category value, assigning one on first use"""
+    if not value:
+        return 0
+    code = entity_code_table.get(value)
+    if code is None:
+        with entity_code_lock:
+            code = entity_code_table.setdefault(value, len(entity_code_table) + 1)
+    return code
+
+def entity_codes(brand, color, item_type, category):
+    """Encode a report's entities and category as one row of the index's entities array"""
+    return np.array([entity_code(brand), entity_code(color), entity_code(item_type), entity_code(category)], dtype=np.int32)
+
+# Selects brand, color, item_type, category, entity_version and, only where the
+# stored entities are outdated, the description to extract them from
+ENTITY_CODE_COLUMNS_SQL = "brand, color, item_type, category, entity_version, CASE WHEN entity_version IS ? THEN NULL ELSE description END"
+
+def row_entity_codes(brand, color, item_type, category, version, description):
+    """Encode entities read with ENTITY_CODE_COLUMNS_SQL, extracting them again if outdated"""
+    if version != ENTITY_VERSION:
+        brand, color, item_type = extract_entity_columns(description)
+    return entity_codes(brand, color, item_type, category)
+
+def load_entity_codes(report_ids):
+    """Read entity codes for the given reports, keyed by report id"""
+    codes = {}
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    for start in range(0, len(report_ids), 500):
+        chunk = report_ids[start:start + 500]
+        cursor.execute(f"SELECT id, {ENTITY_CODE_COLUMNS_SQL} FROM reports WHERE id IN ({','.join(['?'] * len(chunk))})", [ENTITY_VERSION] + chunk)
+        for row in cursor.fetchall():
+            codes[row[0]] = row_entity_codes(*row[1:])
+    conn.close()
+    return codes
+
+def build_embedding_index(previous=None):
+    """Load all report embeddings from the database into a normalized matrix
+    
+    Rows with a missing or stale embedding are left to the backfill job
+    rather than being encoded on the request path.
+    """
+    if EMBEDDING_SIDECAR_PATH:
+        return build_sidecar_index(previous)
+    
+    generation, change_seq = get_change_position()
+    rows = load_index_rows()
+    matrix, scales = quantize_vectors(np.vstack([row[3] for row in rows])) if rows else (None, None)
+    return with_ivf({
+        'ids': np.array([row[0] for row in rows], dtype=np.int64),
+        'matrix': matrix,
+        'scales': scales,
+        'statuses': np.array([row[1] for row in rows], dtype=object),
+        'resolved': np.array([row[2] for row in rows], dtype=bool),
+        'present': np.ones(len(rows), dtype=bool),
+        'entities': np.array([row[4] for row in rows], dtype=np.int32).reshape(len(rows), 4),
+        'dense': False,
+        'version': None,
+        'generation': generation,
+        'change_seq': change_seq
+    }, previous)
+
+def get_change_position():
+    """Return the data generation and the newest report_changes entry, read before the rows an index is built from"""
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT (SELECT value FROM app_meta WHERE key = 'data_generation'), (SELECT MAX(seq) FROM report_changes)")
+    generation, change_seq = cursor.fetchone()
+    conn.close()
+    return int(generation or 0), change_seq or 0
+
+def load_index_rows(report_ids=None):
+    """Read (id, status, resolved, normalized vector, entity codes) for every report with a current embedding, or the given ones"""
+    condition, params = current_embedding_sql()
+    vector_column, dtype_column, _ = embedding_columns()
+    sql = f"SELECT id, status, resolved, {vector_column}, {dtype_column}, {ENTITY_CODE_COLUMNS_SQL} FROM reports WHERE {condition}"
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    if report_ids is None:
+        cursor.execute(sql + " ORDER BY id", (ENTITY_VERSION,) + params)
+        rows = cursor.fetchall()
+    else:
+        rows = []
+        for start in range(0, len(report_ids), 500):
+            chunk = report_ids[start:start + 500]
+            cursor.execute(sql + f" AND id IN ({','.join(['?'] * len(chunk))})", (ENTITY_VERSION,) + params + tuple(chunk))
+            rows.extend(cursor.fetchall())
+    conn.close()
+    return [(report_id, status, bool(is_resolved), normalize_embedding(decode_embedding(embedding_blob, embedding_dtype)),
+             row_entity_codes(*entity_columns))
+            for report_id, status, is_resolved, embedding_blob, embedding_dtype, *entity_columns in rows]
+
+def build_sidecar_index(previous=None):
+    """Build the index over the memory-mapped sidecar, reading only report metadata from SQLite
+    
+    A float32 index uses the mapped file directly, with row number = report id.
+    """
+    dimension = get_embedding_dimension()
+    sidecar = open_embedding_sidecar()
+    if sidecar is None or sidecar.shape[1] != dimension:
+        sync_embedding_sidecar(force=True)
+        sidecar = open_embedding_sidecar()
+    version = get_sidecar_version()
+    generation, change_seq = get_change_position()
+    
+    statuses = np.full(len(sidecar), None, dtype=object)
+    resolved = np.zeros(len(sidecar), dtype=bool)
+    present = np.zeros(len(sidecar), dtype=bool)
+    entities = np.zeros((len(sidecar), 4), dtype=np.int32)
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    condition, params = current_embedding_sql()
+    cursor.execute(f"SELECT id, status, resolved, {ENTITY_CODE_COLUMNS_SQL} FROM reports WHERE id < ? AND {condition}",
+                   (ENTITY_VERSION, len(sidecar)) + params)
+    for report_id, status, is_resolved, *entity_columns in cursor.fetchall():
+        statuses[report_id] = status
+        resolved[report_id] = bool(is_resolved)
+        present[report_id] = True
+        entities[report_id] = row_entity_codes(*entity_columns)
+    conn.close()
+    
+    dense = EMBEDDING_INDEX_DTYPE == "float32"
+    if dense:
+        ids = np.arange(len(sidecar), dtype=np.int64)
+        matrix, scales = sidecar, None
+    else:
+        # Quantized indexes keep a compact heap copy and rescore from the mapped file
+        ids = np.flatnonzero(present)
+        matrix, scales = quantize_vectors(np.asarray(sidecar[ids])) if len(ids) else (None, None)
+        statuses, resolved, present, entities = statuses[ids], resolved[ids], present[ids], entities[ids]
+    
+    return with_ivf({
+        'ids': ids,
+        'matrix': matrix if len(ids) else None,
+        'scales': scales,
+        'statuses': statuses,
+        'resolved': resolved,
+        'present': present,
+        'entities': entities,
+        'dense': dense,
+        'version': version,
+        'generation': generation,
+        'change_seq': change_seq
+    }, previous)
+
+def get_embedding_index():
+    """Return the embedding index, building it on first use and refreshing it when reports have changed"""
+    global embedding_index
+    check_embedding_model_switch()
+    # Another worker process has replaced the shared sidecar, e.g. grown it
+    if embedding_index is not None and EMBEDDING_SIDECAR_PATH and embedding_index['version'] != get_sidecar_version():
+        with embedding_index_lock:
+            if embedding_index is not None and embedding_index['version'] != get_sidecar_version():
+                embedding_index = build_embedding_index(embedding_index)
+                invalidate_search_cache()
+    # Reports inserted, edited, resolved or deleted by any process
+    if embedding_index is not None and embedding_index['generation'] != get_data_generation():
+        with embedding_index_lock:
+            if embedding_index is not None and embedding_index['generation'] != get_data_generation():
+                embedding_index = refresh_embedding_index(embedding_index)
+                invalidate_search_cache()
+    if embedding_index is None:
+        with embedding_index_lock:
+            if embedding_index is None:
+                embedding_index = build_embedding_index()
+    return embedding_index
+
+def refresh_embedding_index(index):
+    """Apply the reports logged in report_changes since the index was built, returning the refreshed index
+    
+    Falls back to a full rebuild when the log no longer reaches back that far
+    or too much has changed to patch.
+    """
+    generation, change_seq = get_change_position()
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM app_meta WHERE key = 'report_changes_pruned'")
+    row = cursor.fetchone()
+    pruned = int(row[0]) if row else 0
+    cursor.execute("SELECT DISTINCT report_id FROM report_changes WHERE seq > ? AND seq <= ?", (index['change_seq'], change_seq))
+    changed = [row[0] for row in cursor.fetchall()]
+    if change_seq - pruned > 2 * REPORT_CHANGES_KEEP:
+        # Trim the log; any worker that has not caught up by then rebuilds
+        conn.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES ('report_changes_pruned', ?)", (str(change_seq - REPORT_CHANGES_KEEP),))
+        conn.execute("DELETE FROM report_changes WHERE seq <= ?", (change_seq - REPORT_CHANGES_KEEP,))
+        conn.commit()
+    conn.close()
+    
+    if pruned > index['change_seq'] or len(changed) > max(INDEX_REFRESH_MAX_ROWS, len(index['ids']) // 10):
+        return build_embedding_index(index)
+    rows = load_index_rows(changed)
+    found = {row[0] for row in rows}
+    removed = [report_id for report_id in changed if report_id not in found]
+    # The writing process copies its vectors into the sidecar after committing, and searches never write it.
+    # A dense index sees rows written in place through its mapping; a replaced file (e.g. grown) has to be mapped again.
+    if index['dense'] and (index['version'] != get_sidecar_version() or any(row[0] >= len(index['ids']) for row in rows)):
+        return build_embedding_index(index)
+    
+    index = apply_index_rows(index, rows, removed)
+    index['generation'], index['change_seq'] = generation, change_seq
+    return index
+
+def apply_index_rows(index, rows, removed_ids=()):
+    """Return a copy of the index with load_index_rows rows added or replaced and removed_ids dropped
+    
+    Copy-on-write, so searches holding the old arrays are never affected.
+    Only the changed rows are assigned to IVF lists.
+    """
+    index = dict(index)
+    if index['dense']:
+        # Row number = report id over the mapped sidecar, which already holds the vectors
+        for key in ('statuses', 'resolved', 'present', 'entities'):
+            index[key] = index[key].copy()
+        for report_id, status, is_resolved, _, codes in rows:
+            index['statuses'][report_id] = status
+            index['resolved'][report_id] = is_resolved
+            index['present'][report_id] = True
+            index['entities'][report_id] = codes
+        for report_id in removed_ids:
+            if report_id < len(index['ids']):
+                index['present'][report_id] = False
+        if index['lists'] is not None and rows:
+            positions = np.array([row[0] for row in rows])
+            index['lists'] = index['lists'].copy()
+            index['lists'][positions] = assign_ivf_lists(np.asarray(index['matrix'][positions]), index['centroids'])
+        return retrain_ivf_if_grown(index)
+    
+    changed_ids = np.array([row[0] for row in rows] + list(removed_ids), dtype=np.int64)
+    positions = {int(index['ids'][position]): position
+                 for position in np.flatnonzero(np.isin(index['ids'], changed_ids))} if index['matrix'] is not None else {}
+    updates = [row for row in rows if row[0] in positions]
+    appends = [row for row in rows if row[0] not in positions]
+    
+    if updates:
+        vectors = np.vstack([row[3] for row in updates])
+        matrix_rows, scales = quantize_vectors(vectors)
+        update_positions = np.array([positions[row[0]] for row in updates])
+        for key in ('matrix', 'scales', 'statuses', 'resolved', 'entities', 'lists'):
+            if index[key] is not None:
+                index[key] = index[key].copy()
+        index['matrix'][update_positions] = matrix_rows
+        if index['scales'] is not None:
+            index['scales'][update_positions] = scales
+        index['statuses'][update_positions] = [row[1] for row in updates]
+        index['resolved'][update_positions] = [row[2] for row in updates]
+        index['entities'][update_positions] = [row[4] for row in updates]
+        if index['lists'] is not None:
+            index['lists'][update_positions] = assign_ivf_lists(vectors, index['centroids'])
+    
+    if appends:
+        vectors = np.vstack([row[3] for row in appends])
+        matrix_rows, scales = quantize_vectors(vectors)
+        statuses = np.array([row[1] for row in appends], dtype=object)
+        resolved = np.array([row[2] for row in appends], dtype=bool)
+        entities = np.array([row[4] for row in appends], dtype=np.int32)
+        new_ids = np.array([row[0] for row in appends], dtype=np.int64)
+        if index['matrix'] is None:
+            index.update(ids=new_ids, matrix=matrix_rows, scales=scales, statuses=statuses, resolved=resolved,
+                         present=np.ones(len(appends), dtype=bool), entities=entities, lists=None, centroids=None, trained_size=0)
+        else:
+            index['ids'] = np.append(index['ids'], new_ids)
+            index['matrix'] = np.vstack([index['matrix'], matrix_rows])
+            if index['scales'] is not None:
+                index['scales'] = np.append(index['scales'], scales)
+            index['statuses'] = np.append(index['statuses'], statuses)
+            index['resolved'] = np.append(index['resolved'], resolved)
+            index['present'] = np.append(index['present'], np.ones(len(appends), dtype=bool))
+            index['entities'] = np.vstack([index['entities'], entities])
+            if index['lists'] is not None:
+                index['lists'] = np.append(index['lists'], assign_ivf_lists(vectors, index['centroids']))
+    
+    removed_positions = [positions[report_id] for report_id in removed_ids if report_id in positions]
+    if removed_positions:
+        keep = np.ones(len(index['ids']), dtype=bool)
+        keep[removed_positions] = False
+        for key in ('ids', 'matrix', 'scales', 'statuses', 'resolved', 'present', 'entities', 'lists'):
+            if index[key] is not None:
+                index[key] = index[key][keep]
+        if not len(index['ids']):
+            index['matrix'] = None
+    
+    return retrain_ivf_if_grown(index)
+
+def retrain_ivf_if_grown(index):
+    """Fit new IVF lists once the corpus reaches MATCH_IVF_MIN_REPORTS or has doubled since the centroids were fitted"""
+    if MATCH_INDEX != "ivf" or index['matrix'] is None:
+        return index
+    # A dense index has a row for every report id, so count the present ones
+    if np.count_nonzero(index['present']) >= max(MATCH_IVF_MIN_REPORTS, 2 * index['trained_size']):
+        return with_ivf(index)
+    return index
+
+def index_upsert_report(report_id, embedding, status=None, codes=None):
+    """Add or replace a report's vector in this process's embedding index, with its entity codes if they changed
+    
+    Other processes pick the change up from report_changes.
+    """
+    global embedding_index
+    if embedding is None:
+        return
+    if EMBEDDING_SIDECAR_PATH:
+        # The next get_embedding_index call picks the change up from the file
+        write_sidecar_vectors([report_id])
+        invalidate_search_cache()
+        return
+    with embedding_index_lock:
+        # Nothing to maintain until the index has been built
+        if embedding_index is None:
+            return
+        resolved = False
+        position = np.flatnonzero(embedding_index['ids'] == report_id) if embedding_index['matrix'] is not None else []
+        if len(position):
+            # Keep what the caller does not know about
+            status = status if status is not None else embedding_index['statuses'][position[0]]
+            codes = codes if codes is not None else embedding_index['entities'][position[0]]
+            resolved = bool(embedding_index['resolved'][position[0]])
+        row = (report_id, status, resolved, normalize_embedding(embedding), codes if codes is not None else np.zeros(4, dtype=np.int32))
+        embedding_index = apply_index_rows(embedding_index, [row])
+    invalidate_search_cache()
+
+def index_mark_resolved(report_id):
+    """Flag a report as resolved so it is no longer offered as a match candidate"""
+    global embedding_index
+    with embedding_index_lock:
+        if embedding_index is None or embedding_index['matrix'] is None:
+            return
+        index = dict(embedding_index)
+        index['resolved'] = np.where(index['ids'] == report_id, True, index['resolved'])
+        embedding_index = index
+
+def index_remove_report(report_id):
+    """Drop a report's vector from this process's embedding index"""
+    global embedding_index
+    if EMBEDDING_SIDECAR_PATH:
+        write_sidecar_vectors([report_id])
+        invalidate_search_cache()
+        return
+    with embedding_index_lock:
+        if embedding_index is None or embedding_index['matrix'] is None:
+            return
+        embedding_index = apply_index_rows(embedding_index, [], [report_id])
+    invalidate_search_cache()
+
+def search_embedding_index(query_embedding, min_score, top_k=None):
+    """Return the best top_k (report_id, score) pairs above min_score, and the ids of all reports above it
+    
+    Only the top_k are sorted; the full id set is for counting and merging.
+    With a quantized index that set comes from the approximate scores.
+    """
+    index = get_embedding_index()
+    if index['matrix'] is None or query_embedding is None:
+        return [], np.zeros(0, dtype=np.int64)
+    
+    query = normalize_embedding(query_embedding)
+    scores = scan_scores(index, query, slice(None))
+    matched = index['ids'][(scores > min_score) & index['present']]
+    if index['matrix'].dtype == np.float32:
+        candidates = np.flatnonzero((scores > min_score) & index['present'])
+    else:
+        candidates = np.flatnonzero((scores > min_score - EMBEDDING_QUANTIZATION_MARGIN) & index['present'])
+    return rank_candidates(index, query, scores, candidates, top_k, min_score=min_score), matched
+
+def select_top(scores, candidates, top_k):
+    """Keep the top_k highest scoring candidate rows, in no particular order"""
+    # Partial selection keeps the cost proportional to top_k, not the corpus
+    if top_k is not None and len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+    return candidates
+
+def rank_candidates(index, query, scores, candidates, top_k=None, min_score=None):
+    """Order candidate rows by score and return the best top_k as (report_id, score) pairs"""
+    rows, row_scores = rank_rows(index, query, scores, candidates, top_k, min_score)
+    return [(int(report_id), float(score)) for report_id, score in zip(index['ids'][rows], row_scores)]
+
+def rank_rows(index, query, scores, candidates, top_k=None, min_score=None):
+    """Order candidate rows by score and return the best top_k rows with their scores
+    
+    With a quantized index the approximate scores only pick a shortlist of
+    EMBEDDING_RESCORE_FACTOR * top_k rows, which is rescored at full precision.
+    """
+    if index['matrix'].dtype != np.float32 and len(candidates):
+        candidates = select_top(scores, candidates, top_k * EMBEDDING_RESCORE_FACTOR if top_k is not None else None)
+        scores = scores.copy()
+        scores[candidates] = rescore_rows(index, query, candidates)
+        if min_score is not None:
+            candidates = candidates[scores[candidates] > min_score]
+    
+    candidates = select_top(scores, candidates, top_k)
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return candidates, scores[candidates]
+
+def match_candidates(query_embedding, status, exclude_id=None, backend=None):
+    """Return (report_id, similarity) pairs for unresolved reports of a status that are worth scoring"""
+    index, rows, similarities = match_candidate_rows(query_embedding, status, exclude_id, backend)
+    return [(int(report_id), float(score)) for report_id, score in zip(index['ids'][rows], similarities)]
+
+def match_candidate_rows(query_embedding, status, exclude_id=None, backend=None):
+    """Return (index, rows, similarities) for unresolved reports of a status that are worth scoring
+    
+    The "exact" backend returns every unresolved report; the "ivf" backend only
+    scans the MATCH_IVF_NPROBE closest inverted lists and keeps the best
+    MATCH_SHORTLIST_SIZE rows.
+    """
+    backend = backend or MATCH_INDEX
+    index = get_embedding_index()
+    if index['matrix'] is None or query_embedding is None:
+        return index, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    
+    query = normalize_embedding(query_embedding)
+    eligible = (index['statuses'] == status) & ~index['resolved']
+    if exclude_id:
+        eligible &= index['ids'] != exclude_id
+    
+    if backend == "ivf" and index['lists'] is not None:
+        probe = np.argsort(-(index['centroids'] @ query))[:MATCH_IVF_NPROBE]
+        eligible &= np.isin(index['lists'], probe)
+    
+    rows = np.flatnonzero(eligible)
+    scores = np.zeros(len(index['ids']), dtype=np.float32)
+    scores[rows] = scan_scores(index, query, rows)
+    rows, similarities = rank_rows(index, query, scores, rows, top_k=None if backend == "exact" else MATCH_SHORTLIST_SIZE)
+    return index, rows, similarities
+
+def check_match_index_recall(sample_size=100):
+    """Measure how many of the exact top MATCH_SHORTLIST_SIZE candidates the ANN shortlist finds"""
+    index = get_embedding_index()
+    if index['matrix'] is None:
+        return None
+    
+    rng = np.random.default_rng(0)
+    present_rows = np.flatnonzero(index['present'])
+    sample = rng.choice(present_rows, min(sample_size, len(present_rows)), replace=False)
+    found = 0
+    expected = 0
+    for row in sample:
+        opposite = "Found" if index['statuses'][row] == "Lost" else "Lost"
+        query = normalize_embedding(dequantize_rows(index, [row])[0])
+        exact = {report_id for report_id, _ in match_candidates(query, opposite, backend="exact")[:MATCH_SHORTLIST_SIZE]}
+        approximate = {report_id for report_id, _ in match_candidates(query, opposite, backend="ivf")}
+        found += len(exact & approximate)
+        expected += len(exact)
+    
+    return found / expected if expected else 1.0
+
+# ------------------- Hybrid Search -------------------
+# /api/search fuses a BM25 ranking from the FTS5 index with the embedding
+# ranking using reciprocal rank fusion, so exact tokens such as a serial
+# fragment or a name surface even when the embedding similarity is low.
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid").strip().lower()  # "hybrid" or "semantic"
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+# Reports found only by full-text search need at least this embedding
+# similarity, so a shared common word alone does not list them
+SEARCH_LEXICAL_MIN_SCORE = float(os.getenv("SEARCH_LEXICAL_MIN_SCORE", "25"))
+# Depth of the one ranking each query's pages are cut from
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "1000"))
+# Words too common to say anything about a report, left out of the FTS query
+SEARCH_STOPWORDS = frozenset("""
+    a about after an and any are as at be been but by can did do for found from had has have he her his how i
+    if in into is it its lost me my near no not of on or our she so some that the their them then there they
+    this to too up was we were what when where which who with you your
+""".split())
+
+def build_fts_query(text):
+    """Turn free text into an FTS5 query matching any of its tokens, longer ones as prefixes
+    
+    Stopwords and single characters are dropped; a query of nothing else
+    matches nothing.
+    """
+    tokens = [token for token in re.findall(r"\w+", text.lower()) if len(token) >= 2 and token not in SEARCH_STOPWORDS]
+    return ' OR '.join(f'"{token}"*' if len(token) >= 3 else f'"{token}"' for token in dict.fromkeys(tokens))
+
+def search_lexical(text, limit=None):
+    """Return ids of the reports best matching text by BM25, best first"""
+    fts_query = build_fts_query(text)
+    if not fts_query:
+        return []
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT rowid FROM reports_fts WHERE reports_fts MATCH ? ORDER BY bm25(reports_fts) LIMIT ?",
+                       (fts_query, -1 if limit is None else limit))
+        report_ids = [row[0] for row in cursor.fetchall()]
+    except sqlite3.OperationalError:
+        # No FTS5 index in this database
+        report_ids = []
+    conn.close()
+    return report_ids
+
+def fuse_rankings(rankings, k=None):
+    """Combine ranked id lists with reciprocal rank fusion, returning {report_id: fused score}"""
+    k = k or SEARCH_RRF_K
+    fused = {}
+    for ranking in rankings:
+        for rank, report_id in enumerate(ranking):
+            fused[report_id] = fused.get(report_id, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+def rank_search(text, min_score):
+    """Rank every result of a search query once, best first, as arrays of report ids and similarities
+    
+    Semantic hits above min_score and BM25 hits are ranked together by
+    reciprocal rank fusion. Similarity is always the embedding score, also
+    for reports found only lexically. Each side contributes at most its best
+    SEARCH_MAX_RESULTS and the ranking is cut to that many, so all pages of a
+    query and its total come from this one window; a total of
+    SEARCH_MAX_RESULTS means more reports may match.
+    """
+    query_embedding = generate_embedding(text)
+    semantic, matched = search_embedding_index(query_embedding, min_score, top_k=SEARCH_MAX_RESULTS)
+    if SEARCH_MODE != "hybrid" or query_embedding is None:
+        ranked = semantic
+    else:
+        # Lexical matches count when they have a current embedding, and those
+        # below min_score only when they are similar enough to the query
+        index = get_embedding_index()
+        lexical = search_lexical(text)
+        if index['matrix'] is not None and lexical:
+            rows = np.flatnonzero(np.isin(index['ids'], lexical) & index['present'])
+            similar = index['ids'][rows][scan_scores(index, normalize_embedding(query_embedding), rows) >= SEARCH_LEXICAL_MIN_SCORE]
+            relevant = set(np.union1d(matched, similar).tolist())
+            lexical = [report_id for report_id in lexical if report_id in relevant][:SEARCH_MAX_RESULTS]
+        else:
+            lexical = []
+        
+        scores = dict(semantic)
+        missing = [report_id for report_id in lexical if report_id not in scores]
+        if missing:
+            query = normalize_embedding(query_embedding)
+            for report_id, vector in load_report_embeddings(missing).items():
+                scores[report_id] = float(np.dot(vector, query) * 100)
+        
+        fused = fuse_rankings([[report_id for report_id, _ in semantic], lexical])
+        ranked = [(report_id, scores[report_id]) for report_id in sorted(scores, key=lambda report_id: fused[report_id], reverse=True)]
+    ranked = ranked[:SEARCH_MAX_RESULTS]
+    return (np.array([report_id for report_id, _ in ranked], dtype=np.int64),
+            np.array([score for _, score in ranked], dtype=np.float64))
+
+def search_page(ranking, limit=None, offset=0):
+    """Cut one page of (report_id, similarity) pairs from a ranking, everything from offset without a limit, with the total number of results"""
+    report_ids, scores = ranking
+    end = offset + limit if limit is not None else None
+    return [(int(report_id), float(score)) for report_id, score in zip(report_ids[offset:end], scores[offset:end])], len(report_ids)
+
+# ------------------- Search Result Cache -------------------
+# Rankings are cached per normalized query and minimum score. Every
+# insert, edit, resolve and delete bumps data_generation in app_meta through
+# triggers, so entries from an older generation are dropped in all worker
+# processes. Changes to this process's index also invalidate it locally.
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+
+search_cache = OrderedDict()
+search_cache_generation = None
+search_cache_epoch = 0
+search_cache_hits = 0
+search_cache_misses = 0
+search_cache_lock = threading.Lock()
+
+def get_data_generation():
+    """Return the data generation counter, bumped by every change to a report"""
+    return int(get_meta('data_generation', '0'))
+
+def invalidate_search_cache():
+    """Drop all cached search results of this process"""
+    global search_cache_epoch
+    with search_cache_lock:
+        search_cache_epoch += 1
+        search_cache.clear()
+
+def sync_search_cache():
+    """Drop cached results from before the current data generation, returning the generation"""
+    global search_cache_generation
+    generation = get_data_generation()
+    with search_cache_lock:
+        if search_cache_generation is None or generation > search_cache_generation:
+            search_cache.clear()
+            search_cache_generation = generation
+    return generation
+
+def cached_hybrid_search(text, min_score, limit=None, offset=0):
+    """Return one page of (report_id, similarity) pairs for a search query, best first, with the total and data generation
+    
+    The cache holds the whole ranking of a query, so every page of it is cut
+    from the same results.
+    """
+    global search_cache_hits, search_cache_misses
+    # Picks up index changes from other processes before anything is looked up
+    get_embedding_index()
+    generation = sync_search_cache()
+    key = (normalize_text(text), min_score)
+    with search_cache_lock:
+        epoch = search_cache_epoch
+        if generation == search_cache_generation and key in search_cache:
+            search_cache.move_to_end(key)
+            search_cache_hits += 1
+            page, total = search_page(search_cache[key], limit, offset)
+            return page, total, generation
+        search_cache_misses += 1
+    
+    # Results computed before the model is ready are empty and not worth keeping
+    model_ready = nlp_model is not None
+    ranking = rank_search(text, min_score)
+    with search_cache_lock:
+        if model_ready and generation == search_cache_generation and epoch == search_cache_epoch:
+            search_cache[key] = ranking
+            while len(search_cache) > SEARCH_CACHE_SIZE:
+                search_cache.popitem(last=False)
+    page, total = search_page(ranking, limit, offset)
+    return page, total, generation
+
+def get_search_cache_stats():
+    """Return hit/miss counters and occupancy of the search result cache"""
+    with search_cache_lock:
+        lookups = search_cache_hits + search_cache_misses
+        return {
+            'hits': search_cache_hits,
+            'misses': search_cache_misses,
+            'hit_rate': round(search_cache_hits / lookups, 4) if lookups else 0.0,
+            'entries': len(search_cache),
+            'max_entries': SEARCH_CACHE_SIZE,
+            'generation': search_cache_generation
+        }
+
+def encode_cursor(position):
+    """Serialize a pagination position into an opaque cursor string"""
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(cursor):
+    """Read back a position created by encode_cursor"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+def is_cursor_position(position):
+    """Whether a decoded cursor holds one of the positions /api/search hands out: an offset, or the (timestamp, id) of a listing's last row"""
+    if set(position) == {'offset'}:
+        return type(position['offset']) is int
+    if set(position) == {'timestamp', 'id'}:
+        return isinstance(position['timestamp'], str) and type(position['id']) is int
+    return False
+
+def get_page_params(data, default_limit=None):
+    """Read limit, offset, cursor and min_score from a search request
+    
+    Returns (limit, offset, min_score, cursor position); an offset cursor
+    sets the offset, a (timestamp, id) position is returned for the caller.
+    """
+    # Cursors come back from clients, so a crafted one must fail cleanly
+    position = decode_cursor(data['cursor']) if data.get('cursor') else {}
+    if position and not is_cursor_position(position):
+        raise ValueError("Invalid cursor")
+    try:
+        limit = int(data['limit']) if data.get('limit') is not None else default_limit
+        offset = int(position.get('offset', data.get('offset') or 0))
+        min_score = float(data['min_score']) if data.get('min_score') is not None else 75
+    except (TypeError, ValueError):
+        raise ValueError("Invalid limit, offset, cursor or min_score")
+    if (limit is not None and limit < 1) or offset < 0 or not 0 <= min_score <= 100:
+        raise ValueError("Invalid limit, offset, cursor or min_score")
+    return limit, offset, min_score, position
+
+# ------------------- Embedding Backfill -------------------
+EMBEDDING_BACKFILL_BATCH_SIZE = int(os.getenv("EMBEDDING_BACKFILL_BATCH_SIZE", "64"))
+
+def get_embedding_dimension():
+    """Return the vector size produced by the current model"""
+    model = get_nlp_model()
+    if model is None:
+        return None
+    return model.get_sentence_embedding_dimension()
+
+def generate_embeddings(texts):
+    """Encode a list of texts in one model call, bypassing the per-request cache and scheduler"""
+    model = get_nlp_model()
+    if model is None:
+        return None
+    return model.encode([normalize_text(text) for text in texts])
+
+def find_reports_needing_embeddings(limit):
+    """Return (id, description, status) for reports whose embedding is missing or from another model"""
+    condition, params = current_embedding_sql()
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, description, status
+        FROM reports
+        WHERE NOT ({condition})
+        ORDER BY id
+        LIMIT ?
+    """, params + (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def backfill_embeddings(batch_size=None):
+    """Encode and persist embeddings for every report that is missing one, returning the count"""
+    batch_size = batch_size or EMBEDDING_BACKFILL_BATCH_SIZE
+    if get_nlp_model() is None:
+        return 0
+    
+    total = 0
+    while True:
+        rows = find_reports_needing_embeddings(batch_size)
+        if not rows:
+            break
+        vectors = generate_embeddings([description for _, description, _ in rows])
+        
+        conn = sqlite3.connect("lost_found.db")
+        cursor = conn.cursor()
+        cursor.executemany("UPDATE reports SET {} = ?, {} = ?, {} = ? WHERE id = ?".format(*embedding_columns()),
+                           [encode_embedding(vector) + (nlp_model_version, report_id) for (report_id, _, _), vector in zip(rows, vectors)])
+        conn.commit()
+        conn.close()
+        
+        if EMBEDDING_SIDECAR_PATH:
+            write_sidecar_vectors([report_id for report_id, _, _ in rows])
+        else:
+            codes = load_entity_codes([report_id for report_id, _, _ in rows])
+            for (report_id, _, status), vector in zip(rows, vectors):
+                index_upsert_report(report_id, vector, status, codes.get(report_id))
+        total += len(rows)
+    
+    return total
+
+# ------------------- Embedding Re-index -------------------
+# Moving to a new model re-embeds every report into the inactive embedding slot
+# in small batches while searches keep using the active model's vectors.
+# Progress lives in the table, so an interrupted re-index resumes where it
+# stopped. Once every row has a staged vector, the switch only points app_meta
+# at the new model and slot; no vectors are copied.
+
+def get_meta(key, default=None):
+    """Read a value from the app_meta table"""
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM app_meta WHERE key = ?", (key,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else default
+
+def set_meta(key, value, cursor=None):
+    """Write a value to the app_meta table, optionally inside the caller's transaction"""
+    if cursor is not None:
+        cursor.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)", (key, value))
+        return
+    conn = sqlite3.connect("lost_found.db")
+    conn.execute("INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)", (key, value))
+    conn.commit()
+    conn.close()
+
+def staged_embedding_sql(slot, model_name):
+    """Return the SQL condition and parameters selecting reports with an embedding from model_name in slot"""
+    vector_column, _, model_column = embedding_columns(slot)
+    return f"{vector_column} IS NOT NULL AND {model_column} = ?", (model_name,)
+
+def get_reindex_status():
+    """Return the active and target models and how many reports have staged embeddings"""
+    target = get_meta('reindex_model')
+    active_model, active_slot = get_active_embedding()
+    condition, params = staged_embedding_sql(other_embedding_slot(active_slot), target)
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*), COUNT(CASE WHEN {condition} THEN 1 END) FROM reports", params)
+    total, staged = cursor.fetchone()
+    conn.close()
+    return {
+        'active_model': active_model,
+        'target_model': target,
+        'staged': staged if target else 0,
+        'total': total
+    }
+
+def stage_next_embeddings(model, model_name, slot, batch_size):
+    """Encode the next batch of reports without a staged embedding into slot, returning how many were staged"""
+    condition, params = staged_embedding_sql(slot, model_name)
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, description FROM reports WHERE NOT ({condition}) ORDER BY id LIMIT ?", params + (batch_size,))
+    rows = cursor.fetchall()
+    conn.close()
+    if not rows:
+        return 0
+    
+    vectors = model.encode([normalize_text(description) for _, description in rows])
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    # Matching on description skips rows edited while the batch was encoding
+    cursor.executemany("UPDATE reports SET {} = ?, {} = ?, {} = ? WHERE id = ? AND description = ?".format(*embedding_columns(slot)),
+                       [encode_embedding(vector) + (model_name, report_id, description) for (report_id, description), vector in zip(rows, vectors)])
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+def switch_embedding_model(model_name, slot):
+    """Activate model_name and the slot holding its staged embeddings in one small transaction
+    
+    Returns False without changing anything if reports were added or edited
+    since the last batch, so the caller stages them and tries again. The
+    previous slot stays untouched, so workers still on the old model keep
+    searching it until they have loaded the new one.
+    """
+    condition, params = staged_embedding_sql(slot, model_name)
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM reports WHERE NOT ({condition}))", params)
+    if cursor.fetchone()[0]:
+        conn.rollback()
+        conn.close()
+        return False
+    set_meta('embedding_model', model_name, cursor)
+    set_meta('embedding_slot', slot, cursor)
+    cursor.execute("DELETE FROM app_meta WHERE key = 'reindex_model'")
+    conn.commit()
+    conn.close()
+    return True
+
+def reindex_embeddings(model_name=None, batch_size=None, progress=None):
+    """Re-embed every report with model_name and switch searches over to it, returning the count
+    
+    Searches keep using the active model until the switch. Running it again
+    after an interruption continues with the reports not yet staged.
+    """
+    model_name = model_name or EMBEDDING_MODEL
+    batch_size = batch_size or EMBEDDING_BACKFILL_BATCH_SIZE
+    if model_name == get_active_embedding_model():
+        return 0
+    
+    model = load_nlp_model(model_name)
+    if model is None:
+        return 0
+    
+    slot = other_embedding_slot(get_active_embedding()[1])
+    # The inactive slot holds the model before the active one, or vectors staged for a different target
+    if get_meta('reindex_model') != model_name:
+        conn = sqlite3.connect("lost_found.db")
+        conn.execute("UPDATE reports SET {} = NULL, {} = NULL, {} = NULL".format(*embedding_columns(slot)))
+        set_meta('reindex_model', model_name, conn.cursor())
+        conn.commit()
+        conn.close()
+    
+    total = 0
+    while True:
+        staged = stage_next_embeddings(model, model_name, slot, batch_size)
+        total += staged
+        if progress is not None and staged:
+            progress(get_reindex_status())
+        if not staged and switch_embedding_model(model_name, slot):
+            break
+    
+    # Serve the new model here right away; other workers pick it up on their next check
+    activate_embedding_model(model_name, model, slot)
+    sync_embedding_sidecar(force=True)
+    # Catch reports written by workers still on the old model during the switch
+    backfill_embeddings(batch_size)
+    return total
+
+def start_embedding_backfill():
+    """Run the entity, image, perceptual hash and embedding backfills, and any pending re-index, in a background thread"""
+    def move_images():
+        count = migrate_report_images()
+        if count:
+            print(f"Moved {count} report images to {IMAGE_STORE_DIR}")
+    
+    def hash_images():
+        count = backfill_image_phashes()
+        if count:
+            print(f"Computed perceptual hashes for {count} images")
+    
+    def embed_reports():
+        count = backfill_embeddings()
+        if count:
+            print(f"Backfilled embeddings for {count} reports")
+    
+    def reindex_reports():
+        if EMBEDDING_MODEL != get_active_embedding_model():
+            count = reindex_embeddings()
+            print(f"Re-indexed {count} reports with {EMBEDDING_MODEL}")
+    
+    def run():
+        # Each job gets its own try, so one failure does not keep the others from running
+        for job in (backfill_entities, move_images, hash_images, sync_embedding_sidecar, embed_reports, reindex_reports):
+            try:
+                job()
+            except Exception:
+                app.logger.exception("Startup job %s failed", job.__name__)
+    
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+# ------------------- Matching (NLP-based) -------------------
+# Points added to the 0-100 similarity for each matching brand, color, item
+# type and category; a candidate needs MATCH_THRESHOLD points in total
+MATCH_COMPONENTS = ("brand", "color", "item_type", "category")
+MATCH_BONUSES = np.array([25, 15, 20, 10], dtype=np.float64)
+MATCH_THRESHOLD = 85
+
+def check_for_matches(description, status, category=None, exclude_id=None):
+    # Generate embedding for the query
+    query_embedding = generate_embedding(description)
+    query_entities = extract_entities(description)
+    query_codes = entity_codes(query_entities.get("brand"), query_entities.get("color"), query_entities.get("item_type"), category)
+    
+    # Only the candidate shortlist from the embedding index is scored
+    index, rows, similarities = match_candidate_rows(query_embedding, status, exclude_id=exclude_id)
+    
+    # Entity and category bonuses are compares against the codes held in the index
+    hits = (index['entities'][rows] == query_codes) & (query_codes != 0)
+    bonuses = hits @ MATCH_BONUSES
+    final_scores = similarities.astype(np.float64) + bonuses
+    passing = final_scores >= MATCH_THRESHOLD
+    report_ids = index['ids'][rows][passing]
+    # Highest score first, ties in report id order
+    order = np.lexsort((report_ids, -final_scores[passing]))
+    match_ids = [int(report_id) for report_id in report_ids[order]]
+    scores = final_scores[passing][order]
+    components = match_components(similarities[passing][order], hits[passing][order])
+    
+    # Summaries carry the secret for the finder email
+    where = "status = ? AND resolved = 0"
+    params = [status]
+    if exclude_id:
+        where += " AND id != ?"
+        params.append(exclude_id)
+    items = {}
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(match_ids), 500):
+        chunk = match_ids[start:start + 500]
+        items.update((item.id, item) for item in select_reports('summary', where + f" AND id IN ({','.join(['?'] * len(chunk))})", params + chunk))
+    
+    return [(items[report_id], float(score), component)
+            for report_id, score, component in zip(match_ids, scores, components) if report_id in items]
+
+def match_components(similarities, hits):
+    """Break match scores down into similarity and the bonus earned by each entity"""
+    bonuses = hits * MATCH_BONUSES
+    return [dict(similarity=round(float(similarity), 2), **dict(zip(MATCH_COMPONENTS, map(int, row))))
+            for similarity, row in zip(similarities, bonuses)]
+
+# ------------------- Match Pairs -------------------
+# Matches are stored once as (lost_id, found_id) pairs so match views and
+# emails read the score instead of recomputing it
+
+def record_matches(cursor, report_id, status, matches, sent):
+    """Store the (item, score, components) matches found for a new report
+    
+    sent holds (lost side emailed, found side emailed) for each match; only
+    those sides are stamped, so send_match_notifications retries the rest.
+    """
+    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    pairs = []
+    for item, score, components in matches:
+        lost_id, found_id = (report_id, item[0]) if status == "Lost" else (item[0], report_id)
+        pairs.append((lost_id, found_id, score, components))
+    notified = [(created_at if lost_sent else None, created_at if found_sent else None) for lost_sent, found_sent in sent]
+    upsert_match_pairs(cursor, pairs, created_at, notified)
+
+def upsert_match_pairs(cursor, pairs, created_at, notified=None):
+    """Insert or re-score (lost_id, found_id, score, components) pairs and flag both sides as matched
+    
+    notified optionally gives each pair's (lost_notified_at, found_notified_at).
+    Existing pairs keep their created_at and notified timestamps.
+    """
+    notified = notified or [(None, None)] * len(pairs)
+    cursor.executemany("""
+        INSERT INTO matches (lost_id, found_id, score, components, created_at, notified_at, lost_notified_at, found_notified_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (lost_id, found_id) DO UPDATE SET score = excluded.score, components = excluded.components
+    """, [(lost_id, found_id, score, json.dumps(components), created_at,
+           max(lost_notified_at, found_notified_at) if lost_notified_at and found_notified_at else None,
+           lost_notified_at, found_notified_at)
+          for (lost_id, found_id, score, components), (lost_notified_at, found_notified_at) in zip(pairs, notified)])
+    ids = sorted({report_id for lost_id, found_id, _, _ in pairs for report_id in (lost_id, found_id)})
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        cursor.execute(f"UPDATE reports SET matched = 1 WHERE id IN ({','.join(['?'] * len(chunk))})", chunk)
+
+# The other side of each pair a report is part of, best match first
+REPORT_MATCHES_SQL = """
+    SELECT r.id, r.name, r.contact, r.description, r.status, r.timestamp, r.resolved, r.category,
+           m.score, m.components, m.created_at
+    FROM matches m JOIN reports r ON r.id = m.found_id WHERE m.lost_id = ?
+    UNION ALL
+    SELECT r.id, r.name, r.contact, r.description, r.status, r.timestamp, r.resolved, r.category,
+           m.score, m.components, m.created_at
+    FROM matches m JOIN reports r ON r.id = m.lost_id WHERE m.found_id = ?
+    ORDER BY 9 DESC, 1
+"""
+
+def get_report_matches(report_id):
+    """Return the stored matches of a report as dicts"""
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute(REPORT_MATCHES_SQL, (report_id, report_id))
+    rows = cursor.fetchall()
+    conn.close()
+    return [{
+        'id': row[0],
+        'name': row[1],
+        'contact': row[2],
+        'description': row[3],
+        'status': row[4],
+        'timestamp': row[5],
+        'resolved': row[6],
+        'category': row[7],
+        'score': row[8],
+        'components': json.loads(row[9]) if row[9] else None,
+        'matched_at': row[10]
+    } for row in rows]
+
+# ------------------- Batch Re-matching -------------------
+# Matching normally happens once, when a report is added. rematch_all_reports
+# scores every unresolved Lost report against every unresolved Found report in
+# blocks of the similarity matrix, so a lower threshold or a better extractor
+# also reaches the existing backlog.
+REMATCH_BLOCK_SIZE = 256
+
+def entity_one_hot(codes, values):
+    """One column per (entity, value) pair, 1 where a report has that value"""
+    return np.hstack([codes[:, column, np.newaxis] == column_values[np.newaxis, :]
+                      for column, column_values in enumerate(values)]).astype(np.float32)
+
+def rematch_all_reports(block_size=None, notify=False, progress=None):
+    """Score all unresolved Lost x Found pairs and store the ones above MATCH_THRESHOLD
+    
+    Entity codes are one-hot encoded next to the vectors, with the Lost side
+    weighted by MATCH_BONUSES, so one matmul per block gives similarity plus
+    bonuses. Pairs near the threshold are then scored exactly as
+    check_for_matches would. Returns counts of the reports compared, the pairs
+    above the threshold, the pairs not stored before and, with notify, the
+    pairs emailed.
+    """
+    block_size = block_size or REMATCH_BLOCK_SIZE
+    index = get_embedding_index()
+    result = {'lost': 0, 'found': 0, 'pairs': 0, 'new': 0, 'notified': 0}
+    if index['matrix'] is None:
+        return result
+    
+    eligible = index['present'] & ~index['resolved']
+    lost_rows = np.flatnonzero(eligible & (index['statuses'] == "Lost"))
+    found_rows = np.flatnonzero(eligible & (index['statuses'] == "Found"))
+    result['lost'], result['found'] = len(lost_rows), len(found_rows)
+    
+    # Only values some Found report has can earn a bonus
+    found_codes = index['entities'][found_rows]
+    values = [np.setdiff1d(found_codes[:, column], [0]) for column in range(len(MATCH_BONUSES))]
+    weights = np.concatenate([np.full(len(column_values), bonus, dtype=np.float32)
+                              for column_values, bonus in zip(values, MATCH_BONUSES)])
+    found_matrix = np.hstack([dequantize_rows(index, found_rows), entity_one_hot(found_codes, values)])
+    # Headroom for float32 rounding of the fused sum, plus quantization error
+    margin = 0.01 if index['matrix'].dtype == np.float32 else EMBEDDING_QUANTIZATION_MARGIN
+    
+    lost_pairs = []
+    found_pairs = []
+    for start in range(0, len(lost_rows), block_size):
+        block = lost_rows[start:start + block_size]
+        lost_matrix = np.hstack([dequantize_rows(index, block) * 100,
+                                 entity_one_hot(index['entities'][block], values) * weights])
+        lost_positions, found_positions = np.nonzero(lost_matrix @ found_matrix.T >= MATCH_THRESHOLD - margin)
+        lost_pairs.append(block[lost_positions])
+        found_pairs.append(found_rows[found_positions])
+        if progress:
+            progress(min(start + block_size, len(lost_rows)), len(lost_rows))
+    lost_pairs = np.concatenate(lost_pairs) if lost_pairs else np.zeros(0, dtype=np.int64)
+    found_pairs = np.concatenate(found_pairs) if found_pairs else np.zeros(0, dtype=np.int64)
+    
+    # Exact scores for the shortlisted pairs, full precision for a quantized index
+    similarities = np.einsum('ij,ij->i', dequantize_rows(index, lost_pairs), dequantize_rows(index, found_pairs)) * 100
+    if index['matrix'].dtype != np.float32 and len(lost_pairs):
+        vectors = load_report_embeddings([int(report_id) for report_id in np.unique(index['ids'][np.concatenate([lost_pairs, found_pairs])])])
+        for position, (lost_row, found_row) in enumerate(zip(lost_pairs, found_pairs)):
+            lost_vector = vectors.get(int(index['ids'][lost_row]))
+            found_vector = vectors.get(int(index['ids'][found_row]))
+            if lost_vector is not None and found_vector is not None:
+                similarities[position] = lost_vector @ found_vector * 100
+    hits = (index['entities'][lost_pairs] == index['entities'][found_pairs]) & (index['entities'][lost_pairs] != 0)
+    scores = similarities.astype(np.float64) + hits @ MATCH_BONUSES
+    passing = scores >= MATCH_THRESHOLD
+    
+    components = match_components(similarities[passing], hits[passing])
+    pairs = [(int(lost_id), int(found_id), float(score), component)
+             for lost_id, found_id, score, component in zip(index['ids'][lost_pairs][passing], index['ids'][found_pairs][passing], scores[passing], components)]
+    result['pairs'] = len(pairs)
+    
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM matches")
+    stored = cursor.fetchone()[0]
+    upsert_match_pairs(cursor, pairs, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    conn.commit()
+    cursor.execute("SELECT COUNT(*) FROM matches")
+    result['new'] = cursor.fetchone()[0] - stored
+    conn.close()
+    
+    if notify:
+        result['notified'] = send_match_notifications()
+    return result
+
+def send_match_notifications():
+    """Email both sides of every stored pair that has not been notified yet, returning the number of pairs fully notified
+    
+    Each side is stamped only when its email was sent, so a failed send is
+    retried on the next run without emailing the other side twice.
+    """
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT m.lost_id, m.found_id, m.lost_notified_at, m.found_notified_at,
+               l.name, l.contact, l.description, l.secret, f.name, f.contact, f.description
+        FROM matches m JOIN reports l ON l.id = m.lost_id JOIN reports f ON f.id = m.found_id
+        WHERE m.notified_at IS NULL AND l.resolved = 0 AND f.resolved = 0
+        ORDER BY m.score DESC
+    """)
+    pending = cursor.fetchall()
+    
+    notified = 0
+    for (lost_id, found_id, lost_notified_at, found_notified_at,
+         lost_name, lost_contact, lost_description, lost_secret, found_name, found_contact, found_description) in pending:
+        if not lost_notified_at:
+            email_body = create_lost_item_found_email(lost_name, found_description, found_name, found_contact)
+            if send_email(lost_contact, "🎉 Your lost item might be found!", email_body, is_html=True):
+                lost_notified_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if not found_notified_at:
+            finder_email_body = create_found_item_match_email(found_name, lost_description, lost_name, lost_contact, lost_secret or "No secret provided")
+            if send_email(found_contact, "🔔 A matching lost item has been reported", finder_email_body, is_html=True):
+                found_notified_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        notified_at = max(lost_notified_at, found_notified_at) if lost_notified_at and found_notified_at else None
+        # Marked one pair at a time so an interrupted run does not email anyone twice
+        cursor.execute("UPDATE matches SET lost_notified_at = ?, found_notified_at = ?, notified_at = ? WHERE lost_id = ? AND found_id = ?",
+                       (lost_notified_at, found_notified_at, notified_at, lost_id, found_id))
+        conn.commit()
+        if notified_at:
+            notified += 1
     
-    for brand in brands:
-        if re.search(r'\b' + brand + r'\b', text.lower()):
-            entities["brand"] = brand
-            break
+    conn.close()
+    return notified
+
+# ------------------- Image Store -------------------
+# Report images are files named by the SHA-256 of their content under
+# IMAGE_STORE_DIR, served by /api/images/<hash> with long-lived caching.
+# reports.image_hash points at the file; reports.image only holds legacy
+# BLOBs until migrate_report_images moves them out.
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "images")
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+IMAGE_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Unused images are only deleted once stored this long ago, so an upload
+# between being stored and its report being saved is never removed
+IMAGE_RELEASE_GRACE_SECONDS = int(os.getenv("IMAGE_RELEASE_GRACE_MINUTES", "60")) * 60
+IMAGE_SWEEP_INTERVAL = int(os.getenv("IMAGE_SWEEP_INTERVAL_MINUTES", "60")) * 60
+
+def image_path(image_hash, size=None):
+    """Path of a stored image or one of its renditions, fanned out into subdirectories by hash prefix"""
+    name = f"{image_hash}.{size}.webp" if size else image_hash
+    return os.path.join(IMAGE_STORE_DIR, image_hash[:2], name)
+
+def write_store_file(path, data):
+    """Write a file into the image store if it is not already there"""
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name so a partial file is never served
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            f.write(data)
+        os.replace(f.name, path)
+
+def store_image(data, image_hash=None):
+    """Write image bytes to the store if not already there and return their hash"""
+    image_hash = image_hash or hashlib.sha256(data).hexdigest()
+    write_store_file(image_path(image_hash), data)
+    return image_hash
+
+def release_image(image_hash):
+    """Delete a stored image once no report uses it and its grace period has passed"""
+    if image_hash:
+        delete_unused_images([image_hash])
+
+def delete_unused_images(image_hashes=None):
+    """Delete stored images no report uses that were stored before the grace period, returning the number deleted
     
-    # Color detection
-    colors = ["black", "white", "red", "blue", "green", "yellow", "purple", 
-              "pink", "brown", "grey", "gray", "silver", "gold"]
+    The row is deleted conditionally and its files removed under one write
+    lock, so an image a report starts using, or an upload stores again, in the
+    meantime is kept. Without hashes every unused image is swept.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=IMAGE_RELEASE_GRACE_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect("lost_found.db", timeout=30)
+    cursor = conn.cursor()
+    # BEGIN IMMEDIATE takes the write lock right away
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if image_hashes is None:
+            cursor.execute("SELECT hash FROM images WHERE refcount <= 0 AND (created_at IS NULL OR created_at < ?)", (cutoff,))
+            image_hashes = [row[0] for row in cursor.fetchall()]
+        deleted = []
+        for image_hash in image_hashes:
+            cursor.execute("DELETE FROM images WHERE hash = ? AND refcount <= 0 AND (created_at IS NULL OR created_at < ?)",
+                           (image_hash, cutoff))
+            if cursor.rowcount:
+                cursor.execute("DELETE FROM image_phash_bands WHERE image_hash = ?", (image_hash,))
+                deleted.append(image_hash)
+        # Removed before the lock is released, as an upload of the same image registers it first
+        for image_hash in deleted:
+            for size in (None,) + tuple(IMAGE_RENDITIONS):
+                try:
+                    os.remove(image_path(image_hash, size))
+                except FileNotFoundError:
+                    pass
+        conn.commit()
+    finally:
+        conn.close()
+    return len(deleted)
+
+def start_image_sweeper():
+    """Periodically delete stored images left unused, e.g. by failed uploads or images released during their grace period
     
-    for color in colors:
-        if re.search(r'\b' + color + r'\b', text.lower()):
-            entities["color"] = color
-            break
+    Started once per serving process by start_process_tasks; sweeps in
+    several processes are safe, as each delete is conditional.
+    """
+    def run():
+        while True:
+            try:
+                count = delete_unused_images()
+                if count:
+                    print(f"Deleted {count} unused images")
+            except Exception as e:
+                print(f"Image sweep error: {e}")
+            time.sleep(IMAGE_SWEEP_INTERVAL)
     
-    # Item type detection - simplified version
-    item_types = {
-        "phone": ["phone", "mobile", "smartphone", "iphone", "android"],
-        "charger": ["charger", "adapter", "power bank"],
-        "laptop": ["laptop", "notebook", "macbook", "computer"],
-        "wallet": ["wallet", "purse", "money", "card holder"],
-        "keys": ["key", "keys", "keychain"],
-        "id": ["id", "card", "identity", "license", "passport"],
-        "bag": ["bag", "backpack", "handbag", "luggage", "suitcase"],
-        "book": ["book", "notebook", "textbook"],
-        "headphone": ["headphone", "earphone", "earbuds", "airpod"],
-        "watch": ["watch", "smartwatch", "apple watch"]
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def image_url(image_hash, size=None):
+    """URL of a stored image or one of its renditions for JSON responses, or None"""
+    if not image_hash:
+        return None
+    # A plain path, as this also runs in streamed responses outside the request context
+    return f"/api/images/{image_hash}" + (f"?size={size}" if size else "")
+
+def image_urls(image_hash):
+    """The image fields of a report in JSON responses: full size, thumbnail and medium rendition"""
+    return {
+        'image_url': image_url(image_hash),
+        'thumbnail_url': image_url(image_hash, 'thumb'),
+        'medium_url': image_url(image_hash, 'medium')
     }
+
+def image_mimetype(header):
+    """Detect the image format from the first bytes of the file"""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG'):
+        return 'image/png'
+    if header.startswith(b'GIF8'):
+        return 'image/gif'
+    if header.startswith(b'RIFF') and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+def migrate_report_images(batch_size=100):
+    """Move image BLOBs still stored in reports into the image store, returning the number moved
     
-    for item_type, keywords in item_types.items():
-        for keyword in keywords:
-            if re.search(r'\b' + keyword + r'\b', text.lower()):
-                entities["item_type"] = item_type
-                break
-        if "item_type" in entities:
+    They are sanitized like new uploads, so no EXIF or GPS data is served.
+    A BLOB Pillow cannot read (e.g. HEIC) or that is too large is left in
+    the database untouched, to be converted by hand.
+    """
+    total = 0
+    last_id = 0
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    while True:
+        cursor.execute("SELECT id, image FROM reports WHERE image IS NOT NULL AND id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+        rows = cursor.fetchall()
+        if not rows:
             break
-            
-    return entities
+        last_id = rows[-1][0]
+        updates = []
+        for report_id, image in rows:
+            try:
+                updates.append((store_upload(bytes(image)), report_id))
+            except ValueError as e:
+                app.logger.warning("Left the image of report %s in the database: %s", report_id, e)
+        cursor.executemany("UPDATE reports SET image_hash = ?, image = NULL WHERE id = ?", updates)
+        conn.commit()
+        total += len(updates)
+    conn.close()
+    return total
 
-def detect_item_category(description):
-    """Extract the likely category of the item from its description using NLP"""
-    description = description.lower()
-    entities = extract_entities(description)
+# ------------------- Image Processing -------------------
+# Uploads are decoded with Pillow, which rejects anything that is not an
+# image, rotated upright from their EXIF orientation, capped at
+# IMAGE_MAX_DIMENSION and re-encoded without metadata (EXIF, GPS, XMP,
+# comments); only the ICC color profile is kept. WebP renditions for listings and previews are generated
+# alongside. Uploads above IMAGE_ASYNC_MIN_KB are processed by a background
+# worker and attached to their report once done.
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+IMAGE_ASYNC_MIN_BYTES = int(os.getenv("IMAGE_ASYNC_MIN_KB", "512")) * 1024
+IMAGE_RENDITIONS = {'thumb': (320, 75), 'medium': (1024, 80)}  # longest side, WebP quality
+# reports.image_status while a background upload is pending or after it failed; NULL otherwise
+IMAGE_STATUS_PROCESSING = "processing"
+IMAGE_STATUS_FAILED = "failed"
+# Refuse images that would decode to more pixels than this (decompression bombs)
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+image_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image")
+
+def image_source(data):
+    """Something Pillow can open: a file object or path as is, bytes wrapped in a buffer"""
+    return io.BytesIO(data) if isinstance(data, bytes) else data
+
+def upload_size(data):
+    """Size in bytes of an upload held as bytes or as a seekable file"""
+    if isinstance(data, bytes):
+        return len(data)
+    data.seek(0, os.SEEK_END)
+    size = data.tell()
+    data.seek(0)
+    return size
+
+def open_upload(data):
+    """Open an upload without decoding its pixels, refusing images above MAX_IMAGE_PIXELS
     
-    if "item_type" in entities:
-        item_type = entities["item_type"]
-        if item_type == "charger" and "phone" in description:
-            return "phone charger"
-        return item_type
+    Pillow itself only raises above twice the limit and merely warns below
+    that, so the size is checked here before anything is decoded.
+    """
+    try:
+        image = Image.open(image_source(data))
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise ValueError("The uploaded image is too large") from e
+    except (OSError, SyntaxError, ValueError) as e:
+        raise ValueError("The uploaded file is not a valid image") from e
+    if image.width * image.height > Image.MAX_IMAGE_PIXELS:
+        raise ValueError("The uploaded image is too large")
+    return image
+
+def open_image(data):
+    """Decode an upload (bytes, file object or path), raising ValueError if it is not a supported image"""
+    image = open_upload(data)
+    try:
+        image.load()
+    except (OSError, SyntaxError, ValueError) as e:
+        raise ValueError("The uploaded file is not a valid image") from e
+    return image
+
+def validate_image(data):
+    """Check that an upload looks like an image of an acceptable size without decoding the pixels"""
+    try:
+        image = open_upload(data)
+        try:
+            image.verify()
+        except (OSError, SyntaxError, ValueError) as e:
+            raise ValueError("The uploaded file is not a valid image") from e
+    finally:
+        if not isinstance(data, bytes):
+            data.seek(0)
+
+# Decoder info that is kept: the color profile and palette transparency
+IMAGE_KEPT_INFO = ("icc_profile", "transparency")
+
+def strip_metadata(image):
+    """Drop EXIF, XMP, comments and other metadata the encoders would copy from the decoded image"""
+    image.info = {key: value for key, value in image.info.items() if key in IMAGE_KEPT_INFO}
+    return image
+
+def encode_image(image, image_format, **options):
+    """Encode a Pillow image to bytes"""
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+def render_renditions(image, image_hash):
+    """Write the WebP renditions of an upright, metadata-free image"""
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    for size, (dimension, quality) in IMAGE_RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail((dimension, dimension), Image.LANCZOS)
+        write_store_file(image_path(image_hash, size), encode_image(rendition, "WEBP", quality=quality, method=4))
+
+def store_upload(data):
+    """Sanitize an uploaded image, store it with its renditions and return its hash"""
+    image = open_image(data)
+    image_format = image.format
+    image = strip_metadata(ImageOps.exif_transpose(image))
+    image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
     
-    categories = {
-        "phone": ["phone", "mobile", "smartphone", "iphone", "android", "samsung", "xiaomi", "oppo", "vivo", "realme", "handset"],
-        "charger": ["charger", "adapter", "power bank", "charging", "usb-c", "lightning", "cable"],
-        "laptop": ["laptop", "notebook", "macbook", "computer", "pc", "chromebook", "ultrabook"],
-        "wallet": ["wallet", "purse", "money", "cash", "card holder", "billfold"],
-        "keys": ["key", "keys", "keychain", "car key", "home key", "room key", "lock key"],
-        "id": ["id", "card", "identity card", "driver license", "passport", "student card", "employee id"],
-        "bag": ["bag", "backpack", "handbag", "luggage", "suitcase", "tote", "duffel"],
-        "book": ["book", "notebook", "textbook", "novel", "diary", "journal", "magazine"],
-        "headphone": ["headphone", "earphone", "earbuds", "airpod", "earpods", "headset"],
-        "watch": ["watch", "smartwatch", "wristwatch", "apple watch", "timepiece"],
-        "clothing": ["jacket", "hoodie", "shirt", "pants", "dress", "scarf", "hat", "cap", "glasses", "sweater"],
-        "jewelry": ["ring", "necklace", "bracelet", "earring", "chain", "pendant"],
-        "electronics": ["tablet", "ipad", "kindle", "camera", "speaker", "power bank"],
-        "stationery": ["pen", "pencil", "marker", "highlighter", "notepad", "folder"]
-    }
+    if image_format == "JPEG" or (image_format not in ("PNG", "WEBP") and image.mode not in ("RGBA", "LA", "P")):
+        stored = encode_image(image.convert("RGB"), "JPEG", quality=90, optimize=True)
+    elif image_format == "WEBP":
+        stored = encode_image(image, "WEBP", quality=90)
+    else:
+        # PNG, and other formats with transparency
+        stored = encode_image(image, "PNG", optimize=True)
     
-    best_category = "other"
-    best_score = 0
+    # Registered before the files are written, which restarts the grace period of an image being released
+    image_hash = hashlib.sha256(stored).hexdigest()
+    register_image(image_hash, perceptual_hash(image))
+    store_image(stored, image_hash)
+    render_renditions(image, image_hash)
+    return image_hash
+
+def ensure_rendition(image_hash, size):
+    """Generate a missing rendition from the stored image, e.g. for images migrated from the database"""
+    path = image_path(image_hash, size)
+    if not os.path.exists(path):
+        with open(image_path(image_hash), 'rb') as f:
+            image = open_image(f.read())
+        render_renditions(strip_metadata(ImageOps.exif_transpose(image)), image_hash)
+    return path
+
+def process_report_image(report_id, data, previous_hash=None):
+    """Store an upload (bytes or a temporary file path) and attach it to its report, releasing the image it replaces
     
-    for category, keywords in categories.items():
-        score = 0
-        for keyword in keywords:
-            if keyword in description:
-                score += 1
-        
-        if score > best_score:
-            best_score = score
-            best_category = category
+    A failure is logged and recorded as the report's image_status, so the
+    owner sees that the image needs to be uploaded again.
+    """
+    try:
+        image_hash = store_upload(data)
+    except Exception:
+        app.logger.exception("Image processing failed for report %s", report_id)
+        set_image_status(report_id, IMAGE_STATUS_FAILED)
+        return
+    finally:
+        if isinstance(data, str):
+            os.remove(data)
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("UPDATE reports SET image_hash = ?, image = NULL, image_status = NULL WHERE id = ?", (image_hash, report_id))
+    attached = cursor.rowcount
+    conn.commit()
+    conn.close()
+    # The report may have been deleted while the image was processed
+    release_image(previous_hash if attached else image_hash)
+
+def save_report_image(data):
+    """Validate an upload and return its hash, or None if it will be attached by a background worker
     
-    if best_category == "charger" and any(device in description for device in categories["phone"]):
-        return "phone charger"
+    Small images are processed right away; larger ones are only validated here
+    and must be handed to queue_report_image once the report row exists.
+    """
+    if upload_size(data) < IMAGE_ASYNC_MIN_BYTES:
+        return store_upload(data)
+    validate_image(data)
+    return None
+
+def queue_report_image(report_id, data, previous_hash=None):
+    """Process a large upload off the request thread
     
-    return best_category
+    A file upload is copied to a temporary file of its own first, since the
+    request's upload file is closed when the request ends.
+    """
+    if not isinstance(data, bytes):
+        with tempfile.NamedTemporaryFile(prefix="upload-", delete=False) as f:
+            shutil.copyfileobj(data, f)
+        data = f.name
+    set_image_status(report_id, IMAGE_STATUS_PROCESSING)
+    image_executor.submit(process_report_image, report_id, data, previous_hash)
 
-# ------------------- Matching (NLP-based) -------------------
-def check_for_matches(description, status, category=None, exclude_id=None):
-    # Generate embedding for the query
-    query_embedding = generate_embedding(description)
-    query_entities = extract_entities(description)
+def set_image_status(report_id, image_status):
+    """Record the state of a report's background image processing"""
+    conn = sqlite3.connect("lost_found.db")
+    conn.execute("UPDATE reports SET image_status = ? WHERE id = ?", (image_status, report_id))
+    conn.commit()
+    conn.close()
+
+# ------------------- Image Deduplication -------------------
+# Identical uploads share one stored file through the content hash; the images
+# table counts the reports using each one. For near-duplicates (the same
+# photo re-saved, resized or recompressed) every image gets a 64-bit DCT
+# perceptual hash, split into four 16-bit bands indexed in image_phash_bands.
+# Two hashes within 3 bits of each other must agree on at least one band, so
+# candidate pairs come from band equality joins instead of comparing every
+# pair of images, and only those are checked for their Hamming distance.
+IMAGE_PHASH_BANDS = 4
+IMAGE_DUPLICATE_MAX_DISTANCE = int(os.getenv("IMAGE_DUPLICATE_MAX_DISTANCE", "3"))
+# DCT-II basis for the 32x32 grayscale thumbnail the hash is taken from
+PHASH_DCT = np.cos(np.pi * np.outer(np.arange(32), 2 * np.arange(32) + 1) / 64)
+
+def perceptual_hash(image):
+    """64-bit perceptual hash of a Pillow image: the signs of its 8x8 lowest DCT frequencies against their median"""
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (PHASH_DCT @ pixels @ PHASH_DCT.T)[:8, :8]
+    bits = np.packbits((low > np.median(low)).ravel())
+    phash = int.from_bytes(bits.tobytes(), 'big')
+    # Stored as a signed SQLite integer
+    return phash - (1 << 64) if phash >= 1 << 63 else phash
+
+def phash_band_keys(phash):
+    """Index keys of a perceptual hash: band number and band value packed into one integer"""
+    phash &= (1 << 64) - 1
+    return [(band << 16) | ((phash >> (16 * band)) & 0xFFFF) for band in range(IMAGE_PHASH_BANDS)]
+
+def hamming_distance(a, b):
+    """Number of differing bits between two perceptual hashes"""
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+def register_image(image_hash, phash):
+    """Record a stored image and its perceptual hash; its reference count starts at zero until a report uses it"""
+    conn = sqlite3.connect("lost_found.db", timeout=30)
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO images (hash, phash, refcount, created_at) VALUES (?, ?, 0, ?)
+        ON CONFLICT (hash) DO UPDATE SET phash = excluded.phash, created_at = excluded.created_at
+    """, (image_hash, phash, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    cursor.executemany("INSERT OR IGNORE INTO image_phash_bands (band_key, image_hash) VALUES (?, ?)",
+                       [(key, image_hash) for key in phash_band_keys(phash)])
+    conn.commit()
+    conn.close()
+
+def backfill_image_phashes():
+    """Compute the perceptual hash of stored images that do not have one yet, returning the number hashed"""
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT hash FROM images WHERE phash IS NULL AND refcount > 0")
+    missing = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    total = 0
+    for image_hash in missing:
+        try:
+            image = open_image(image_path(image_hash))
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Could not hash image {image_hash}: {e}")
+            continue
+        register_image(image_hash, perceptual_hash(ImageOps.exif_transpose(image)))
+        total += 1
+    return total
+
+def find_duplicate_images(max_distance=None):
+    """Pairs of images in use whose perceptual hashes differ by at most max_distance bits, as (hash, hash, distance)
     
+    Candidates share at least one band, which finds every pair up to
+    IMAGE_PHASH_BANDS - 1 bits apart; larger distances only match pairs that
+    happen to share a band.
+    """
+    max_distance = IMAGE_DUPLICATE_MAX_DISTANCE if max_distance is None else max_distance
     conn = sqlite3.connect("lost_found.db")
     cursor = conn.cursor()
-    # Explicitly request all columns to ensure we get the secret column and embedding
-    query = "SELECT id, name, contact, description, status, timestamp, resolved, secret, category, embedding FROM reports WHERE status = ? AND resolved = 0"
-    params = [status]
-    if exclude_id:
-        query += " AND id != ?"
-        params.append(exclude_id)
-    cursor.execute(query, params)
-    items = cursor.fetchall()
+    cursor.execute("""
+        SELECT DISTINCT a.image_hash, b.image_hash, ia.phash, ib.phash
+        FROM image_phash_bands a
+        JOIN image_phash_bands b ON b.band_key = a.band_key AND b.image_hash > a.image_hash
+        JOIN images ia ON ia.hash = a.image_hash
+        JOIN images ib ON ib.hash = b.image_hash
+        WHERE ia.refcount > 0 AND ib.refcount > 0
+    """)
+    pairs = []
+    for hash_a, hash_b, phash_a, phash_b in cursor:
+        distance = hamming_distance(phash_a, phash_b)
+        if distance <= max_distance:
+            pairs.append((hash_a, hash_b, distance))
     conn.close()
+    return pairs
 
-    matches = []
-    for item in items:
-        # Get embedding from db if it exists, otherwise generate it
-        item_embedding = None
-        if item[9] is not None:  # Check if embedding exists in database
-            # Convert from binary to numpy array
-            item_embedding = np.frombuffer(item[9], dtype=np.float32)
-        else:
-            # Generate embedding if not found in database
-            item_embedding = generate_embedding(item[3])
-        
-        # Calculate semantic similarity using embeddings
-        similarity_score = compute_similarity(query_embedding, item_embedding)
-        
-        # Extract entities from item description
-        item_entities = extract_entities(item[3])
-        
-        # Entity matching bonus
-        entity_bonus = 0
-        
-        # Brand matching - strong signal
-        if "brand" in query_entities and "brand" in item_entities:
-            if query_entities["brand"] == item_entities["brand"]:
-                entity_bonus += 25
-                
-        # Color matching - good signal
-        if "color" in query_entities and "color" in item_entities:
-            if query_entities["color"] == item_entities["color"]:
-                entity_bonus += 15
-                
-        # Item type matching - important signal
-        if "item_type" in query_entities and "item_type" in item_entities:
-            if query_entities["item_type"] == item_entities["item_type"]:
-                entity_bonus += 20
-        
-        # Category matching bonus (if categories exist and match)
-        category_bonus = 0
-        item_category = item[8] if len(item) > 8 and item[8] else None
-        
-        if category and item_category and category == item_category:
-            category_bonus = 10  # Boost for same category
-        
-        # Final score combines semantic similarity with entity matching bonuses
-        final_score = similarity_score + entity_bonus + category_bonus
-        
-        # Threshold for considering a match - increased for better accuracy
-        if final_score >= 85:
-            matches.append((item, final_score))
+def duplicate_report_groups(max_distance=None):
+    """Groups of reports whose images are identical or near-duplicates, newest group first
+    
+    Each group carries the largest image distance that joined it, 0 when all
+    its reports share one image.
+    """
+    # Union-find over image hashes: near-duplicate pairs plus images shared by several reports
+    parent = {}
+    def find(image_hash):
+        while parent.setdefault(image_hash, image_hash) != image_hash:
+            parent[image_hash] = parent[parent[image_hash]]
+            image_hash = parent[image_hash]
+        return image_hash
+    
+    pairs = find_duplicate_images(max_distance)
+    for hash_a, hash_b, _ in pairs:
+        parent[find(hash_a)] = find(hash_b)
+    conn = sqlite3.connect("lost_found.db")
+    cursor = conn.cursor()
+    cursor.execute("SELECT hash FROM images WHERE refcount > 1")
+    for (image_hash,) in cursor.fetchall():
+        find(image_hash)
+    if not parent:
+        conn.close()
+        return []
+    
+    conn.close()
     
-    # Sort matches by score (highest first)
-    matches.sort(key=lambda x: x[1], reverse=True)
+    groups = {}
+    for report in select_reports('detail', "image_hash IN (SELECT value FROM json_each(?))", (json.dumps(list(parent)),),
+                                 "timestamp DESC, id DESC"):
+        groups.setdefault(find(report.image_hash), []).append({
+            'id': report.id,
+            'name': report.name,
+            'contact': report.contact,
+            'description': report.description,
+            'status': report.status,
+            'timestamp': report.timestamp,
+            'resolved': report.resolved,
+            'user_id': report.user_id,
+            'image_hash': report.image_hash,
+            'image_status': report.image_status,
+            **image_urls(report.image_hash)
+        })
     
-    return [match[0] for match in matches]
+    distances = {}
+    for hash_a, _, distance in pairs:
+        root = find(hash_a)
+        distances[root] = max(distances.get(root, 0), distance)
+    # Reports are newest first, so groups come out ordered by their newest report
+    return [{'reports': reports, 'max_distance': distances.get(root, 0)}
+            for root, reports in groups.items() if len(reports) > 1]
 
 # ------------------- Add Report -------------------
 def add_report(name, contact, description, status, secret=None, image=None, user_id=None):
+    # Validate and store the image first, an invalid upload raises ValueError
+    image_hash = save_report_image(image) if image is not None else None
+    
     # Generate embedding
     embedding = generate_embedding(description)
     
-    # Detect item category using improved NLP approach
-    category = detect_item_category(description)
+    # Detect item category and entities from one scan of the description
+    category, entities = analyze_description(description)
     
     conn = sqlite3.connect("lost_found.db")
     cursor = conn.cursor()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Convert embedding to binary for storage
-    embedding_binary = embedding.tobytes()
+    embedding_binary, embedding_dtype = encode_embedding(embedding)
+    brand, color, item_type = entities.get("brand"), entities.get("color"), entities.get("item_type")
     
-    cursor.execute("INSERT INTO reports (name, contact, description, status, timestamp, secret, category, embedding, matched, image, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                   (name.strip(), contact.strip(), description.strip().lower(), status, timestamp, secret, category, embedding_binary, 0, image, user_id))
+    cursor.execute("INSERT INTO reports (name, contact, description, status, timestamp, secret, category, {}, {}, {}, brand, color, item_type, entity_version, matched, image_hash, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)".format(*embedding_columns()),
+                   (name.strip(), contact.strip(), description.strip().lower(), status, timestamp, secret, category, embedding_binary, embedding_dtype, nlp_model_version, brand, color, item_type, ENTITY_VERSION, 0, image_hash, user_id))
     conn.commit()
     new_report_id = cursor.lastrowid
+    if image is not None and image_hash is None:
+        queue_report_image(new_report_id, image)
+    index_upsert_report(new_report_id, embedding, status, entity_codes(brand, color, item_type, category))
     matches = []
-    email_sent = False
+    # (lost side emailed, found side emailed) for each match
+    sent = []
 
     if status == "Lost":
         matches = check_for_matches(description, "Found", category=category, exclude_id=new_report_id)
         
         # Send email to lost item reporter about found matches
-        for match in matches:
+        for match, _, _ in matches:
             email_body = create_lost_item_found_email(name, match[3], match[1], match[2])
-            send_email(contact, "🎉 Your lost item might be found!", email_body, is_html=True)
+            lost_sent = send_email(contact, "🎉 Your lost item might be found!", email_body, is_html=True)
             
             # Also send email to the finder that a matching lost item has been reported
             finder_email_body = create_found_item_match_email(match[1], description, name, contact, secret or "No secret provided")
-            send_email(match[2], "🔔 A matching lost item has been reported", finder_email_body, is_html=True)
-        
-        if matches:
-            email_sent = True
+            found_sent = send_email(match[2], "🔔 A matching lost item has been reported", finder_email_body, is_html=True)
+            sent.append((lost_sent, found_sent))
 
     else:  # status == "Found"
         matches = check_for_matches(description, "Lost", category=category, exclude_id=new_report_id)
         
         # Send individual emails to each person who lost an item
-        for lost in matches:
+        lost_sent = []
+        for lost, _, _ in matches:
             email_body = create_lost_item_found_email(lost[1], description, name, contact)
-            send_email(lost[2], "🎉 Your lost item might be found!", email_body, is_html=True)
+            lost_sent.append(send_email(lost[2], "🎉 Your lost item might be found!", email_body, is_html=True))
         
         # Send a summary email to finder with all matched lost items
         if matches and len(matches) > 0:
             matches_details = ""
-            for i, lost in enumerate(matches):
-                # lost is a tuple: (id, name, contact, description, status, timestamp, resolved, secret, category, embedding)
+            for i, (lost, _, components) in enumerate(matches):
+                # lost is a ReportSummary: (id, name, contact, description, status, timestamp, resolved, secret, category, ...)
                 lost_secret = lost[7] if len(lost) > 7 and lost[7] else "No secret provided"
-                # Get embeddings and compute similarity
-                item_embedding = None
-                if lost[9] is not None and len(lost) > 9:  # Check if embedding exists in database
-                    item_embedding = np.frombuffer(lost[9], dtype=np.float32)
-                else:
-                    item_embedding = generate_embedding(lost[3])
-                    
-                similarity_score = compute_similarity(embedding, item_embedding)
+                # The similarity was stored with the match, nothing is recomputed
+                similarity_score = components['similarity']
                 
                 matches_details += f"""
                 <div class="match-item">
@@ -1085,26 +3540,141 @@ def add_report(name, contact, description, status, secret=None, image=None, user
                 """
             
             summary_body = create_finder_summary_email(name, len(matches), matches_details)
-            send_email(contact, f"🔍 Your found item matches {len(matches)} lost reports", summary_body, is_html=True)
-            email_sent = True
+            # The finder's one summary email covers every match
+            found_sent = send_email(contact, f"🔍 Your found item matches {len(matches)} lost reports", summary_body, is_html=True)
+            sent = [(sent_to_owner, found_sent) for sent_to_owner in lost_sent]
 
     if matches:
-        ids = tuple([new_report_id] + [m[0] for m in matches])
-        qmarks = ','.join(['?'] * len(ids))
-        # Update matched status instead of resolved
-        cursor.execute(f"UPDATE reports SET matched = 1 WHERE id IN ({qmarks})", ids)
+        # Store the pairs and update matched status instead of resolved
+        record_matches(cursor, new_report_id, status, matches, sent)
         conn.commit()
 
     conn.close()
+    email_sent = bool(sent) and all(lost_sent and found_sent for lost_sent, found_sent in sent)
     return matches, email_sent, category
 
-def get_reports():
+# ------------------- Report Queries -------------------
+# Typed column projections of the reports table, so each reader names the
+# columns it uses: summary for listings, search results and match candidates,
+# detail when the owner and entities are needed too, embedding for loading
+# vectors. Only the embedding projection reads a BLOB, and none reads the
+# legacy image column. Rows come back as named tuples, which still unpack
+# and index like the plain tuples they replace.
+ReportSummary = namedtuple('ReportSummary', ['id', 'name', 'contact', 'description', 'status', 'timestamp',
+                                             'resolved', 'secret', 'category', 'matched', 'image_hash', 'image_status'])
+ReportDetail = namedtuple('ReportDetail', ReportSummary._fields + ('user_id', 'brand', 'color', 'item_type'))
+ReportEmbedding = namedtuple('ReportEmbedding', ['id', 'embedding', 'embedding_dtype'])
+REPORT_PROJECTIONS = {'summary': ReportSummary, 'detail': ReportDetail, 'embedding': ReportEmbedding}
+
+def report_columns(projection):
+    """SQL column list of a projection, the embedding one reading the serving model's slot"""
+    if projection == 'embedding':
+        vector_column, dtype_column, _ = embedding_columns()
+        return f"id, {vector_column} AS embedding, {dtype_column} AS embedding_dtype"
+    return ", ".join(REPORT_PROJECTIONS[projection]._fields)
+
+def select_reports(projection, where=None, params=(), order_by=None, limit=None, offset=0):
+    """Yield reports as rows of the given projection, streamed from the cursor"""
+    sql = f"SELECT {report_columns(projection)} FROM reports"
+    if where:
+        sql += f" WHERE {where}"
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params = tuple(params) + (limit if limit is not None else -1, offset)
+    row_type = REPORT_PROJECTIONS[projection]
+    rows = iter_rows(sql, params)
+    try:
+        for row in rows:
+            yield row_type._make(row)
+    finally:
+        rows.close()
+
+def iter_rows(sql, params=(), chunk_size=100):
+    """Yield the rows of a query from the cursor in chunks instead of fetching them all at once"""
+    conn = sqlite3.connect("lost_found.db")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def get_reports_by_ids(report_ids, projection='summary', chunk_size=50):
+    """Yield rows of the given projection for the given ids, preserving the order of report_ids"""
+    for start in range(0, len(report_ids), chunk_size):
+        chunk = report_ids[start:start + chunk_size]
+        qmarks = ','.join(['?'] * len(chunk))
+        rows_by_id = {row.id: row for row in select_reports(projection, f"id IN ({qmarks})", tuple(chunk))}
+        for report_id in chunk:
+            if report_id in rows_by_id:
+                yield rows_by_id[report_id]
+
+def get_reports_page(status=None, limit=None, offset=0, after=None):
+    """Return an iterator over report summaries newest first, optionally for one status, plus the total count
+    
+    after is the (timestamp, id) of the last row of the previous page and
+    continues from there through the index instead of skipping offset rows.
+    """
+    where = []
+    params = []
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    
     conn = sqlite3.connect("lost_found.db")
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, contact, description, status, timestamp, resolved, secret, category, embedding, matched, image FROM reports ORDER BY timestamp DESC")
-    rows = cursor.fetchall()
+    cursor.execute(f"SELECT COUNT(*) FROM reports {where_sql}", params)
+    total = cursor.fetchone()[0]
     conn.close()
-    return rows
+    
+    if after is not None:
+        where.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+        params.extend([after[0], after[0], after[1]])
+    rows = select_reports('summary', ' AND '.join(where), params, "timestamp DESC, id DESC", limit, offset)
+    return rows, total
+
+def iter_keyword_results(rows, limit, page):
+    """Yield (row, 100) for up to limit rows, setting page['next_cursor'] if more follow"""
+    last = None
+    for position, r in enumerate(rows):
+        if limit is not None and position == limit:
+            # Continue after the last row rather than by offset, so new reports don't shift pages
+            page['next_cursor'] = encode_cursor({'timestamp': last.timestamp, 'id': last.id})
+            rows.close()
+            break
+        last = r
+        yield r, 100
+
+# ------------------- Streaming Responses -------------------
+# Opt-in NDJSON mode: one JSON object per line, written while rows are still
+# being read, so large listings never exist in memory as one payload.
+
+def wants_ndjson(data=None):
+    """Whether the client asked for a streamed NDJSON response"""
+    if data and data.get('stream'):
+        return True
+    return request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def ndjson_response(items):
+    """Stream an iterable of dicts as newline-delimited JSON
+    
+    An error after streaming has started is reported as a final
+    {"success": false} line, since the status code has already been sent.
+    """
+    def generate():
+        try:
+            for item in items:
+                yield json.dumps(item) + '\n'
+        except Exception as e:
+            yield json.dumps({'success': False, 'message': str(e)}) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
 
 # ------------------- Context Processor -------------------
 @app.context_processor
@@ -1165,20 +3735,15 @@ def contact():
 @app.route('/api/report', methods=['POST'])
 @api_login_required
 def report_item():
+    """Submit a report as multipart/form-data with an optional image file, or as JSON with a base64 data URL"""
     try:
-        data = request.get_json()
+        data, image_data = get_report_upload()
         name = data.get('name')
         contact = data.get('contact')
         description = data.get('description')
         status = data.get('status')
         secret = data.get('secret', '')
         
-        # Handle image upload if present
-        image_data = None
-        if 'image' in data and data['image']:
-            # Convert base64 image to bytes
-            image_data = base64.b64decode(data['image'].split(',')[1])
-        
         # Get current user ID
         user_id = session.get('user_id')
         
@@ -1190,78 +3755,150 @@ def report_item():
             'category': category,
             'matches': len(matches),
             'email_sent': email_sent,
-            'match_details': [{'description': m[3], 'contact': m[2], 'name': m[1]} for m in matches]
+            'match_details': [{'description': m[3], 'contact': m[2], 'name': m[1], 'score': round(score, 1)} for m, score, _ in matches]
         })
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def get_report_upload():
+    """Return the report fields and the image of an upload, or None if there is no image
+    
+    Multipart images are read from the file Werkzeug spools to disk, so memory
+    stays bounded; JSON bodies carry the image as a base64 data URL.
+    """
+    if request.mimetype == 'multipart/form-data':
+        image = request.files.get('image')
+        return request.form, image.stream if image and image.filename else None
+    
+    data = request.get_json()
+    if not data.get('image'):
+        return data, None
+    try:
+        # Expect data URL like 'data:image/jpeg;base64,....'
+        return data, base64.b64decode(data['image'].split(',')[1] if ',' in data['image'] else data['image'])
+    except binascii.Error as e:
+        raise ValueError("The uploaded file is not a valid image") from e
+
 @app.route('/api/search/refresh', methods=['POST'])
 def refresh_search():
-    """Force refresh search results - clears any potential cache"""
+    """Drop cached search results made stale by report changes and return the data generation
+    
+    Clients compare the generation with the one their results came with and
+    search again when it has moved on.
+    """
     try:
-        all_reports = get_reports()
-        return jsonify({'success': True, 'message': f'Search refreshed - {len(all_reports)} reports available'})
+        # The index catches up first, so the returned generation is one searches can already see
+        index = get_embedding_index()
+        invalidate_search_cache()
+        sync_search_cache()
+        generation = index['generation']
+        conn = sqlite3.connect("lost_found.db")
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM reports")
+        report_count = cursor.fetchone()[0]
+        conn.close()
+        return jsonify({'success': True, 'message': f'Search refreshed - {report_count} reports available', 'generation': generation})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/images/<image_hash>')
+def serve_image(image_hash):
+    """Serve a stored report image; the URL changes with the content, so it can be cached forever
+    
+    ?size=thumb or ?size=medium selects a WebP rendition instead of the full image.
+    """
+    size = request.args.get('size')
+    if not IMAGE_HASH_PATTERN.match(image_hash) or not os.path.exists(image_path(image_hash)) or (size and size not in IMAGE_RENDITIONS):
+        return jsonify({'success': False, 'message': 'Image not found'}), 404
+    try:
+        path = os.path.abspath(ensure_rendition(image_hash, size) if size else image_path(image_hash))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Image not found'}), 404
+    with open(path, 'rb') as f:
+        mimetype = image_mimetype(f.read(12))
+    # conditional=True answers If-None-Match with 304 and Range requests with 206
+    response = send_file(path, mimetype=mimetype, conditional=True, etag=f"{image_hash}-{size}" if size else image_hash,
+                         max_age=IMAGE_CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def format_search_result(r, score):
+    """Convert a report summary into the JSON shape the frontend renders"""
+    return {
+        'id': r.id,
+        'name': r.name,
+        'contact': r.contact,
+        'description': r.description,
+        'status': r.status,
+        'timestamp': r.timestamp,
+        'resolved': r.resolved,
+        'category': r.category,
+        'secret': r.secret,
+        'score': score,
+        'image_status': r.image_status,
+        **image_urls(r.image_hash)
+    }
+
+def format_report_summary(r):
+    """Convert a report summary into the JSON shape of the report listings"""
+    return {
+        'id': r.id,
+        'name': r.name,
+        'contact': r.contact,
+        'description': r.description,
+        'status': r.status,
+        'timestamp': r.timestamp,
+        'resolved': r.resolved,
+        'secret': r.secret,
+        'category': r.category,
+        'matched': r.matched,
+        'image_status': r.image_status,
+        **image_urls(r.image_hash)
+    }
+
 @app.route('/api/search', methods=['POST'])
 def search_items():
     try:
         data = request.get_json()
         search_query = data.get('query', '')
         
-        all_reports = get_reports()
-        results = []
-        
-        if search_query.lower() == "lost":
-            for r in all_reports:
-                if r[4] == "Lost":
-                    results.append((r, 100))
-        elif search_query.lower() == "found":
-            for r in all_reports:
-                if r[4] == "Found":
-                    results.append((r, 100))
-        elif search_query.lower() == "all":
-            for r in all_reports:
-                results.append((r, 100))
+        if search_query.lower() in ("lost", "found", "all"):
+            # Keywords list every matching report unless a limit is given
+            limit, offset, _, position = get_page_params(data)
+            after = (position['timestamp'], position['id']) if 'timestamp' in position else None
+            status = search_query.capitalize() if search_query.lower() != "all" else None
+            # One extra row tells whether another page follows
+            rows, total = get_reports_page(status, limit + 1 if limit is not None else None, offset, after)
+            page = {'total': total, 'next_cursor': None, 'generation': get_data_generation(), 'total_capped': False}
+            results = iter_keyword_results(rows, limit, page)
         else:
-            query_embedding = generate_embedding(search_query)
-            
-            for r in all_reports:
-                similarity_score = 0
-                if len(r) > 9 and r[9] is not None:
-                    item_embedding = np.frombuffer(r[9], dtype=np.float32)
-                    similarity_score = compute_similarity(query_embedding, item_embedding)
-                else:
-                    item_embedding = generate_embedding(r[3])
-                    similarity_score = compute_similarity(query_embedding, item_embedding)
-                    
-                if similarity_score > 75:
-                    results.append((r, similarity_score))
-        
-        results.sort(key=lambda x: x[1], reverse=True)
-        
-        formatted_results = []
-        for r, score in results:
-            image_base64 = None
-            if len(r) > 11 and r[11] is not None:
-                image_base64 = base64.b64encode(r[11]).decode('utf-8')
+            # Like the keywords, a query returns all its results unless a limit is given
+            limit, offset, min_score, _ = get_page_params(data)
+            hits, total, generation = cached_hybrid_search(search_query, min_score, limit, offset)
+            scores = dict(hits)
+            more = limit is not None and offset + limit < total
+            page = {'total': total, 'next_cursor': encode_cursor({'offset': offset + limit}) if more else None, 'generation': generation,
+                    'total_capped': total >= SEARCH_MAX_RESULTS}
             
-            formatted_results.append({
-                'id': r[0],
-                'name': r[1],
-                'contact': r[2],
-                'description': r[3],
-                'status': r[4],
-                'timestamp': r[5],
-                'resolved': r[6] if len(r) > 6 else 0,
-                'category': r[8] if len(r) > 8 else None,
-                'secret': r[7] if len(r) > 7 else None,
-                'score': score,
-                'image': image_base64
-            })
-        
-        return jsonify({'success': True, 'results': formatted_results})
+            # Already ranked by rank_search
+            results = ((r, scores[r.id]) for r in get_reports_by_ids([report_id for report_id, _ in hits]))
+        
+        formatted_results = (format_search_result(r, score) for r, score in results)
+        if wants_ndjson(data):
+            # Result lines, then a summary line once the page is complete
+            def lines():
+                yield from formatted_results
+                yield {'success': True, **page}
+            return ndjson_response(lines())
+        
+        formatted_results = list(formatted_results)
+        return jsonify({'success': True, 'results': formatted_results, **page})
+    except ValueError as e:
+        # Malformed limit, offset, cursor or min_score
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -1486,33 +4123,76 @@ def admin_reports():
     """Get all reports for admin dashboard"""
     
     try:
+        reports = (format_report_summary(report) for report in select_reports('summary', order_by="timestamp DESC"))
+        if wants_ndjson():
+            def lines():
+                yield from reports
+                yield {'success': True}
+            return ndjson_response(lines())
+        
+        return jsonify({'success': True, 'reports': list(reports)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/admin/matches')
+@admin_required
+def admin_matches():
+    """Get stored Lost/Found match pairs, best first - admin only
+    
+    ?report_id= limits the list to the pairs one report is part of.
+    """
+    
+    try:
+        sql = """
+            SELECT m.lost_id, m.found_id, m.score, m.components, m.created_at,
+                   l.description, l.name, l.contact, l.resolved, f.description, f.name, f.contact, f.resolved
+            FROM matches m JOIN reports l ON l.id = m.lost_id JOIN reports f ON f.id = m.found_id
+        """
+        params = ()
+        report_id = request.args.get('report_id', type=int)
+        if report_id is not None:
+            # Two branches so each side is an index seek
+            sql = f"{sql} WHERE m.lost_id = ? UNION ALL {sql} WHERE m.found_id = ?"
+            params = (report_id, report_id)
+        sql += " ORDER BY 3 DESC, 1, 2"
+        
+        def format_match(row):
+            return {
+                'lost': {'id': row[0], 'description': row[5], 'name': row[6], 'contact': row[7], 'resolved': row[8]},
+                'found': {'id': row[1], 'description': row[9], 'name': row[10], 'contact': row[11], 'resolved': row[12]},
+                'score': row[2],
+                'components': json.loads(row[3]) if row[3] else None,
+                'matched_at': row[4]
+            }
+        
+        matches = (format_match(row) for row in iter_rows(sql, params))
+        if wants_ndjson():
+            def lines():
+                yield from matches
+                yield {'success': True}
+            return ndjson_response(lines())
+        
+        return jsonify({'success': True, 'matches': list(matches)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/admin/duplicates')
+@admin_required
+def admin_duplicates():
+    """Get groups of reports submitted with the same or a near-identical photo - admin only
+    
+    ?max_distance= sets how many perceptual hash bits may differ (default IMAGE_DUPLICATE_MAX_DISTANCE).
+    """
+    
+    try:
+        max_distance = request.args.get('max_distance', type=int)
+        groups = duplicate_report_groups(max_distance)
         conn = sqlite3.connect("lost_found.db")
         cursor = conn.cursor()
-        cursor.execute("SELECT id, name, contact, description, status, timestamp, resolved, secret, category, embedding, matched, image FROM reports ORDER BY timestamp DESC")
-        reports_data = cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM images WHERE phash IS NULL AND refcount > 0")
+        unhashed = cursor.fetchone()[0]
         conn.close()
-        
-        reports = []
-        for report_tuple in reports_data:
-            image_base64 = None
-            if len(report_tuple) > 11 and report_tuple[11] is not None:
-                image_base64 = base64.b64encode(report_tuple[11]).decode('utf-8')
-            
-            reports.append({
-                'id': report_tuple[0],
-                'name': report_tuple[1],
-                'contact': report_tuple[2],
-                'description': report_tuple[3],
-                'status': report_tuple[4],
-                'timestamp': report_tuple[5],
-                'resolved': report_tuple[6],
-                'secret': report_tuple[7],
-                'category': report_tuple[8],
-                'matched': report_tuple[10],
-                'image': image_base64
-            })
-        
-        return jsonify({'success': True, 'reports': reports})
+        return jsonify({'success': True, 'groups': groups, 'unhashed_images': unhashed})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -1526,8 +4206,9 @@ def delete_report(report_id):
         cursor = conn.cursor()
         
         # First check if the report exists
-        cursor.execute("SELECT id FROM reports WHERE id = ?", (report_id,))
-        if not cursor.fetchone():
+        cursor.execute("SELECT id, image_hash FROM reports WHERE id = ?", (report_id,))
+        report = cursor.fetchone()
+        if not report:
             conn.close()
             return jsonify({'success': False, 'message': f'Report {report_id} not found'})
         
@@ -1542,6 +4223,8 @@ def delete_report(report_id):
             return jsonify({'success': False, 'message': f'Failed to delete report {report_id}'})
         
         conn.close()
+        index_remove_report(report_id)
+        release_image(report[1])
         return jsonify({'success': True, 'message': f'Report {report_id} deleted successfully'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -1560,7 +4243,7 @@ def user_delete_report(report_id):
         cursor = conn.cursor()
         
         # Check if report exists and belongs to user
-        cursor.execute("SELECT id, user_id FROM reports WHERE id = ?", (report_id,))
+        cursor.execute("SELECT id, user_id, image_hash FROM reports WHERE id = ?", (report_id,))
         report = cursor.fetchone()
         
         if not report:
@@ -1578,6 +4261,8 @@ def user_delete_report(report_id):
         cursor.execute("DELETE FROM reports WHERE id = ? AND user_id = ?", (report_id, user_id))
         conn.commit()
         conn.close()
+        index_remove_report(report_id)
+        release_image(report[2])
         
         return jsonify({'success': True, 'message': 'Report deleted successfully'})
         
@@ -1590,23 +4275,22 @@ def user_edit_report(report_id):
     """Allow users to edit their own reports"""
     try:
         user_id = session.get('user_id')
-        data = request.get_json()
         
         if not user_id:
             return jsonify({'success': False, 'message': 'User not logged in'})
         
-        # Get fields from request
+        # Get fields from request, multipart or JSON with an optional data URL
+        data, image_bytes = get_report_upload()
         name = data.get('name')
         contact = data.get('contact')
         description = data.get('description')
         secret = data.get('secret', '')
-        image_base64 = data.get('image')  # optional data URL
         
         conn = sqlite3.connect("lost_found.db")
         cursor = conn.cursor()
         
         # Check if report exists and belongs to user
-        cursor.execute("SELECT id, user_id FROM reports WHERE id = ?", (report_id,))
+        cursor.execute("SELECT id, user_id, image_hash, status FROM reports WHERE id = ?", (report_id,))
         report = cursor.fetchone()
         
         if not report:
@@ -1622,32 +4306,48 @@ def user_edit_report(report_id):
         
         # Prepare updates: recompute category and embedding if description provided
         updated_description = description.strip().lower() if description else None
-        updated_category = detect_item_category(updated_description) if updated_description else None
+        updated_category, updated_entities = None, None
+        if updated_description:
+            # Category and entities from one scan of the description, as when adding a report
+            updated_category, entities = analyze_description(updated_description)
+            updated_entities = (entities.get("brand"), entities.get("color"), entities.get("item_type"))
         updated_embedding = generate_embedding(updated_description) if updated_description else None
-        embedding_binary = updated_embedding.tobytes() if updated_embedding is not None else None
+        embedding_binary, embedding_dtype = encode_embedding(updated_embedding) if updated_embedding is not None else (None, None)
         
-        # Optional image decode
-        image_bytes = None
-        if image_base64:
+        image_hash = None
+        if image_bytes is not None:
             try:
-                # Expect data URL like 'data:image/jpeg;base64,....'
-                image_bytes = base64.b64decode(image_base64.split(',')[1] if ',' in image_base64 else image_base64)
-            except Exception:
-                image_bytes = None
+                image_hash = save_report_image(image_bytes)
+            except ValueError as e:
+                conn.close()
+                return jsonify({'success': False, 'message': str(e)})
         
         # Build dynamic SQL to avoid overwriting when not provided (defensive)
-        update_fields = ["name = ?", "contact = ?", "description = ?", "secret = ?"]
+        # A re-index in progress must re-embed the new description
+        vector_column, dtype_column, model_column = embedding_columns()
+        update_fields = ["name = ?", "contact = ?", "description = ?", "secret = ?",
+                         f"{embedding_columns(other_embedding_slot(nlp_model_slot))[0]} = NULL"]
         params = [name.strip(), contact.strip(), updated_description, secret]
         
         if embedding_binary is not None:
-            update_fields.append("embedding = ?")
+            update_fields.append(f"{vector_column} = ?")
             params.append(embedding_binary)
+            update_fields.append(f"{dtype_column} = ?")
+            params.append(embedding_dtype)
+            update_fields.append(f"{model_column} = ?")
+            params.append(nlp_model_version)
         if updated_category is not None:
             update_fields.append("category = ?")
             params.append(updated_category)
-        if image_bytes is not None:
-            update_fields.append("image = ?")
-            params.append(image_bytes)
+        if updated_entities is not None:
+            update_fields.extend(["brand = ?", "color = ?", "item_type = ?", "entity_version = ?"])
+            params.extend(updated_entities + (ENTITY_VERSION,))
+        if image_hash is not None:
+            update_fields.append("image_hash = ?")
+            params.append(image_hash)
+            # A legacy BLOB would otherwise be migrated over the new image
+            update_fields.append("image = NULL")
+            update_fields.append("image_status = NULL")
         
         params.extend([report_id, user_id])
         sql = f"UPDATE reports SET {', '.join(update_fields)} WHERE id = ? AND user_id = ?"
@@ -1656,8 +4356,18 @@ def user_edit_report(report_id):
         conn.commit()
         conn.close()
         
+        if image_hash is not None:
+            release_image(report[2])
+        elif image_bytes is not None:
+            queue_report_image(report_id, image_bytes, previous_hash=report[2])
+        # The report may not be indexed yet, e.g. if its embedding was missing
+        index_upsert_report(report_id, updated_embedding, report[3],
+                            codes=entity_codes(*updated_entities, updated_category) if updated_entities is not None else None)
+        
         return jsonify({'success': True, 'message': 'Report updated successfully'})
         
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -1672,6 +4382,7 @@ def resolve_report(report_id):
         cursor.execute("UPDATE reports SET resolved = 1 WHERE id = ?", (report_id,))
         conn.commit()
         conn.close()
+        index_mark_resolved(report_id)
         return jsonify({'success': True, 'message': f'Report {report_id} marked as resolved'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -1786,6 +4497,38 @@ def admin_stats():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/admin/cache-stats')
+@admin_required
+def admin_cache_stats():
+    """Get embedding and search cache statistics - admin only"""
+    
+    try:
+        return jsonify({'success': True, 'embedding_cache': get_embedding_cache_stats(), 'search_cache': get_search_cache_stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# ------------------- Health Checks -------------------
+@app.route('/healthz')
+def healthz():
+    """Liveness probe - the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe - only ready once the AI model has loaded and warmed up
+    
+    The probe starts loading the model itself, so readiness never waits for
+    other traffic, also with NLP_MODEL_PRELOAD=0.
+    """
+    if nlp_model_state != "ready":
+        start_model_loading()
+    ready = nlp_model_state == "ready"
+    return jsonify({
+        'status': 'ready' if ready else 'not_ready',
+        'model': nlp_model_state,
+        'embedding_index': 'ready' if embedding_index is not None else 'not_loaded'
+    }), 200 if ready else 503
+
 # ------------------- Authentication Routes -------------------
 @app.route('/login')
 def login():
@@ -2062,46 +4805,16 @@ def get_user_reports():
         if not user_id:
             return jsonify({'success': False, 'message': 'User not logged in'})
         
-        conn = sqlite3.connect("lost_found.db")
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, name, contact, description, status, timestamp, resolved, secret, category, matched, image 
-            FROM reports 
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-        """, (user_id,))
-        
-        reports_data = cursor.fetchall()
-        conn.close()
-        
         reports = []
-        for report_tuple in reports_data:
-            image_base64 = None
-            if len(report_tuple) > 10 and report_tuple[10] is not None:
-                image_base64 = base64.b64encode(report_tuple[10]).decode('utf-8')
-            
+        for report in select_reports('summary', "user_id = ?", (user_id,), "timestamp DESC"):
             # Determine status text
             status_text = "Pending"
-            if report_tuple[6] == 1:  # resolved
+            if report.resolved == 1:
                 status_text = "Resolved"
-            elif report_tuple[9] == 1:  # matched
+            elif report.matched == 1:
                 status_text = "Matched"
             
-            reports.append({
-                'id': report_tuple[0],
-                'name': report_tuple[1],
-                'contact': report_tuple[2],
-                'description': report_tuple[3],
-                'status': report_tuple[4],
-                'timestamp': report_tuple[5],
-                'resolved': report_tuple[6],
-                'secret': report_tuple[7],
-                'category': report_tuple[8],
-                'matched': report_tuple[9],
-                'image': image_base64,
-                'status_text': status_text
-            })
+            reports.append({**format_report_summary(report), 'status_text': status_text})
         
         return jsonify({
             'success': True,
@@ -2111,6 +4824,31 @@ def get_user_reports():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/user/reports/<int:report_id>/matches')
+@api_login_required
+def get_user_report_matches(report_id):
+    """Get the stored matches of one of the current user's reports"""
+    try:
+        user_id = session.get('user_id')
+        
+        if not user_id:
+            return jsonify({'success': False, 'message': 'User not logged in'})
+        
+        conn = sqlite3.connect("lost_found.db")
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id FROM reports WHERE id = ?", (report_id,))
+        report = cursor.fetchone()
+        conn.close()
+        
+        if not report:
+            return jsonify({'success': False, 'message': 'Report not found'})
+        if report[0] != user_id:
+            return jsonify({'success': False, 'message': 'You can only view matches of your own reports'})
+        
+        return jsonify({'success': True, 'matches': get_report_matches(report_id)})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/profile')
 @login_required
 def profile():
@@ -2555,11 +5293,31 @@ def exchange_google_code():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
 
+def start_process_tasks():
+    """Start the background work every serving process runs, once per process"""
+    global process_tasks_started
+    with process_tasks_lock:
+        if process_tasks_started:
+            return
+        process_tasks_started = True
+    if NLP_MODEL_PRELOAD:
+        start_model_loading()
+    start_image_sweeper()
+
+@app.before_request
+def start_process_tasks_on_first_request():
+    """Start the per-process background work under any server, also a WSGI server, without making the request wait"""
+    if not process_tasks_started:
+        start_process_tasks()
+
 if __name__ == '__main__':
+    debug = True
     init_db()
+    # The reloader's monitor process only restarts the server, it never serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_process_tasks()
+        start_embedding_backfill()
     import webbrowser
-    import threading
-    import time
     
     def open_browser():
         time.sleep(1.5)  # Wait for server to start
@@ -2568,4 +5326,4 @@ if __name__ == '__main__':
     # Start browser in a separate thread
     threading.Thread(target=open_browser).start()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=debug, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Script to generate embeddings for reports that are missing them
+Usage: python backfill_embeddings.py [batch_size]
+"""
+
+import sys
+from app import backfill_embeddings, find_reports_needing_embeddings, get_nlp_model
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    if get_nlp_model() is None:
+        print("❌ Error: Could not load the AI model, no embeddings generated")
+        sys.exit(1)
+
+    pending = len(find_reports_needing_embeddings(sys.maxsize))
+    if not pending:
+        print("✅ All reports already have up-to-date embeddings")
+        sys.exit(0)
+
+    print(f"Generating embeddings for {pending} report(s)...")
+    count = backfill_embeddings(batch_size)
+    print(f"✅ Success! Stored embeddings for {count} report(s)")
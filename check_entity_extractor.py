@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check that the compiled entity extractor agrees with the original keyword loops
+Usage: python check_entity_extractor.py [corpus_file]
+
+The corpus is every report description in the database, a generated set of
+keyword combinations, and optionally a file with one description per line.
+"""
+
+import os
+import random
+import re
+import sqlite3
+import sys
+from app import detect_item_category, entity_vocabulary, extract_entities
+
+def legacy_extract_entities(text):
+    """The original per-keyword regex loops"""
+    entities = {}
+    for brand in entity_vocabulary['brands']:
+        if re.search(r'\b' + brand + r'\b', text.lower()):
+            entities["brand"] = brand
+            break
+    for color in entity_vocabulary['colors']:
+        if re.search(r'\b' + color + r'\b', text.lower()):
+            entities["color"] = color
+            break
+    for item_type, keywords in entity_vocabulary['item_types'].items():
+        for keyword in keywords:
+            if re.search(r'\b' + keyword + r'\b', text.lower()):
+                entities["item_type"] = item_type
+                break
+        if "item_type" in entities:
+            break
+    return entities
+
+def legacy_detect_item_category(description):
+    """The original substring scoring over the category keywords"""
+    description = description.lower()
+    entities = legacy_extract_entities(description)
+    if "item_type" in entities:
+        item_type = entities["item_type"]
+        if item_type == "charger" and "phone" in description:
+            return "phone charger"
+        return item_type
+
+    categories = entity_vocabulary['categories']
+    best_category = "other"
+    best_score = 0
+    for category, keywords in categories.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in description:
+                score += 1
+        if score > best_score:
+            best_score = score
+            best_category = category
+    if best_category == "charger" and any(device in description for device in categories["phone"]):
+        return "phone charger"
+    return best_category
+
+SAMPLE_TEXTS = [
+    "Black Apple Watch with a cracked strap",
+    "apple watch",
+    "APPLE iPhone 13 in a red case",
+    "samsung notebook, grey",
+    "keychain with car key and room key",
+    "student card holder (blue)",
+    "earrings and a gold necklace",
+    "pendant pen pencil",
+    "power bank + usb-c cable",
+    "phone charger near the hp laptop",
+    "hp-laptop charger",
+    "id_card lost",
+    "i lost my idcard",
+    "handbag/backpack/luggage",
+    "capsule hat cap",
+    "Zielone portfel z kartą",
+    "Ünïcode wallet naïve café",
+    "",
+]
+
+def generate_texts(count, seed=0):
+    """Random keyword combinations with glued, hyphenated and cased variants"""
+    keywords = list(entity_vocabulary['prefixes'])
+    fillers = ["my", "a", "near", "with", "lost", "the", "in", "x", "2"]
+    separators = [" ", " ", " ", "", "-", "_", ", ", "/", "."]
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        parts = [rng.choice(keywords if rng.random() < 0.6 else fillers) for _ in range(rng.randint(1, 7))]
+        text = parts[0]
+        for part in parts[1:]:
+            text += rng.choice(separators) + part
+        texts.append(text.upper() if rng.random() < 0.1 else text)
+    return texts
+
+corpus = list(SAMPLE_TEXTS)
+if os.path.exists("lost_found.db"):
+    conn = sqlite3.connect("lost_found.db")
+    try:
+        corpus += [row[0] for row in conn.execute("SELECT description FROM reports") if row[0]]
+    except sqlite3.OperationalError:
+        pass
+    conn.close()
+if len(sys.argv) > 1:
+    with open(sys.argv[1], encoding='utf-8') as f:
+        corpus += [line.rstrip('\n') for line in f if line.strip()]
+corpus += generate_texts(5000)
+
+print("\n" + "=" * 60)
+print("  Entity Extractor Regression Check")
+print("=" * 60)
+
+mismatches = []
+for text in corpus:
+    expected = (legacy_extract_entities(text), legacy_detect_item_category(text))
+    actual = (extract_entities(text), detect_item_category(text))
+    if expected != actual:
+        mismatches.append((text, expected, actual))
+
+print(f"\n   Texts checked: {len(corpus)}")
+if mismatches:
+    print(f"\n❌ {len(mismatches)} mismatch(es):")
+    for text, expected, actual in mismatches[:20]:
+        print(f"   {text!r}")
+        print(f"      expected: {expected}")
+        print(f"      actual:   {actual}")
+    print("\n" + "=" * 60)
+    sys.exit(1)
+
+print("\n✅ Compiled extractor matches the original results")
+print("\n" + "=" * 60)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Check recall of the approximate match index against exact scanning
+Usage: python check_match_index.py [sample_size]
+"""
+
+import sys
+import app
+
+sample_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+print("\n" + "=" * 60)
+print("  Match Index Recall Check")
+print("=" * 60)
+
+index = app.get_embedding_index()
+report_count = len(index['ids'])
+
+print("\n⚙️  Configuration:")
+print("-" * 60)
+print(f"   MATCH_INDEX: {app.MATCH_INDEX}")
+print(f"   MATCH_SHORTLIST_SIZE: {app.MATCH_SHORTLIST_SIZE}")
+print(f"   MATCH_IVF_NPROBE: {app.MATCH_IVF_NPROBE}")
+print(f"   MATCH_IVF_MIN_REPORTS: {app.MATCH_IVF_MIN_REPORTS}")
+
+print("\n📊 Index:")
+print("-" * 60)
+print(f"   Indexed reports: {report_count}")
+if index['lists'] is not None:
+    print(f"   Inverted lists: {len(index['centroids'])}")
+else:
+    print("   Inverted lists: not trained (shortlist is exact below MATCH_IVF_MIN_REPORTS)")
+
+recall = app.check_match_index_recall(sample_size)
+
+print("\n🎯 Recall:")
+print("-" * 60)
+if recall is None:
+    print("   ❌ No embeddings indexed yet")
+else:
+    print(f"   Recall@{app.MATCH_SHORTLIST_SIZE} over {min(sample_size, report_count)} sample queries: {recall:.3f}")
+    if recall < 0.95:
+        print("   ⚠️  Consider raising MATCH_IVF_NPROBE or MATCH_SHORTLIST_SIZE,")
+        print("      or set MATCH_INDEX=exact to scan every report")
+    else:
+        print("   ✅ Shortlist agrees with exact scanning")
+
+print("\n" + "=" * 60)
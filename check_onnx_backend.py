@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Check that the ONNX embedding backend matches the torch model within tolerance
+Usage: python check_onnx_backend.py [model_file]
+"""
+
+import sys
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from app import EMBEDDING_MODEL, ONNX_MODEL_DIR, ONNX_MODEL_FILE, OnnxEmbeddingModel, compute_similarity
+
+model_file = sys.argv[1] if len(sys.argv) > 1 else ONNX_MODEL_FILE
+quantized = "int8" in model_file
+
+# Cosine between torch and ONNX vectors of the same text, and drift of the
+# 0-100 match score between two texts (the threshold is 85 points)
+MIN_COSINE = 0.98 if quantized else 0.9999
+MAX_SCORE_DRIFT = 3.0 if quantized else 0.1
+
+SAMPLE_TEXTS = [
+    "black samsung phone with a cracked screen",
+    "blue leather wallet with student card inside",
+    "silver apple macbook laptop in a grey sleeve",
+    "red backpack with textbooks and a water bottle",
+    "house keys on a keychain with a small torch",
+    "gold wristwatch found near the library",
+    "white airpods case lost in the cafeteria",
+    "passport and driver license in a brown folder",
+    "cartera negra con tarjetas",
+    "portefeuille bleu perdu près de la bibliothèque",
+]
+
+print("\n" + "=" * 60)
+print("  ONNX Backend Check")
+print("=" * 60)
+
+print(f"\n   Model: {ONNX_MODEL_DIR}/{model_file}")
+torch_model = SentenceTransformer(EMBEDDING_MODEL)
+onnx_model = OnnxEmbeddingModel(ONNX_MODEL_DIR, model_file)
+
+torch_embeddings = torch_model.encode(SAMPLE_TEXTS)
+onnx_embeddings = onnx_model.encode(SAMPLE_TEXTS)
+
+cosines = [compute_similarity(t, o) / 100 for t, o in zip(torch_embeddings, onnx_embeddings)]
+drifts = []
+for i in range(len(SAMPLE_TEXTS)):
+    for j in range(i + 1, len(SAMPLE_TEXTS)):
+        torch_score = compute_similarity(torch_embeddings[i], torch_embeddings[j])
+        onnx_score = compute_similarity(onnx_embeddings[i], onnx_embeddings[j])
+        drifts.append(abs(torch_score - onnx_score))
+
+print("\n📊 Agreement:")
+print("-" * 60)
+print(f"   Min cosine to torch embedding: {min(cosines):.6f} (required >= {MIN_COSINE})")
+print(f"   Max match score drift: {max(drifts):.3f} points (allowed <= {MAX_SCORE_DRIFT})")
+print(f"   Single-text encode matches batch: {np.allclose(onnx_model.encode(SAMPLE_TEXTS[0]), onnx_embeddings[0], atol=1e-4)}")
+
+if min(cosines) >= MIN_COSINE and max(drifts) <= MAX_SCORE_DRIFT:
+    print("\n✅ ONNX backend matches torch within tolerance")
+    print("   Enable it with EMBEDDING_BACKEND=onnx" + (f" and ONNX_MODEL_FILE={model_file}" if model_file != "model.onnx" else ""))
+    print("\n" + "=" * 60)
+else:
+    print("\n❌ ONNX backend is outside tolerance, keep EMBEDDING_BACKEND=torch")
+    print("\n" + "=" * 60)
+    sys.exit(1)
@@ -0,0 +1,54 @@
+"""
+Script to export the configured sentence transformer model (EMBEDDING_MODEL) to ONNX for the onnx embedding backend
+Usage: python export_onnx_model.py [--quantize]
+
+Requires torch, sentence-transformers and onnxruntime. Writes model.onnx (and
+model_int8.onnx with --quantize) plus the tokenizer files to ONNX_MODEL_DIR.
+"""
+
+import os
+import sys
+import torch
+from sentence_transformers import SentenceTransformer
+from app import EMBEDDING_MODEL, ONNX_MODEL_DIR
+
+def export_model(output_dir, quantize=False):
+    """Export the transformer behind the sentence model, returning the written model paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    sentence_model = SentenceTransformer(EMBEDDING_MODEL, device='cpu')
+    transformer = sentence_model[0].auto_model.eval()
+    tokenizer = sentence_model.tokenizer
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["a black wallet"], return_tensors='pt')
+    model_path = os.path.join(output_dir, "model.onnx")
+    torch.onnx.export(
+        transformer,
+        (sample['input_ids'], sample['attention_mask']),
+        model_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=['token_embeddings'],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            'token_embeddings': {0: 'batch', 1: 'sequence'}
+        },
+        opset_version=14
+    )
+    paths = [model_path]
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(output_dir, "model_int8.onnx")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        paths.append(quantized_path)
+
+    return paths
+
+if __name__ == "__main__":
+    quantize = "--quantize" in sys.argv[1:]
+    for path in export_model(ONNX_MODEL_DIR, quantize):
+        print(f"✅ Wrote {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+    print("\nVerify it with: python check_onnx_backend.py")
+    if quantize:
+        print("            and: python check_onnx_backend.py model_int8.onnx")
@@ -0,0 +1,49 @@
+"""
+Script to move report images stored as BLOBs in the database into the image store
+Usage: python migrate_images.py [batch_size] [--vacuum]
+
+Images are sanitized like new uploads, written to IMAGE_STORE_DIR under their
+SHA-256 and the BLOBs are cleared; BLOBs that are not readable images are
+left in the database and logged. Stored images without a perceptual hash (stored before duplicate
+detection existed) are then hashed for /api/admin/duplicates, and unused
+images stored over IMAGE_RELEASE_GRACE_MINUTES ago are deleted.
+--vacuum afterwards returns the freed space to the file system.
+"""
+
+import sqlite3
+import sys
+from app import IMAGE_STORE_DIR, backfill_image_phashes, delete_unused_images, init_db, migrate_report_images
+
+if __name__ == "__main__":
+    vacuum = "--vacuum" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--vacuum"]
+    batch_size = int(args[0]) if args else 100
+
+    init_db()
+    print(f"Moving report images to {IMAGE_STORE_DIR}/...")
+    count = migrate_report_images(batch_size)
+    if not count:
+        print("✅ No images to move")
+    else:
+        print(f"✅ Success! Moved {count} image(s)")
+
+    print("Computing perceptual hashes for duplicate detection...")
+    hashed = backfill_image_phashes()
+    if not hashed:
+        print("✅ All images are already hashed")
+    else:
+        print(f"✅ Hashed {hashed} image(s)")
+
+    print("Deleting unused images...")
+    deleted = delete_unused_images()
+    if not deleted:
+        print("✅ No unused images")
+    else:
+        print(f"✅ Deleted {deleted} unused image(s)")
+
+    if vacuum:
+        print("Compacting the database...")
+        conn = sqlite3.connect("lost_found.db")
+        conn.execute("VACUUM")
+        conn.close()
+        print("✅ Database compacted")
@@ -0,0 +1,35 @@
+"""
+Script to re-embed all reports with a new model and switch searches over to it
+Usage: python reindex_embeddings.py [model_name] [batch_size]
+
+Searches keep using the active model until every report has been re-embedded.
+An interrupted run can simply be started again and resumes where it stopped.
+"""
+
+import sys
+from app import EMBEDDING_MODEL, get_active_embedding_model, get_reindex_status, reindex_embeddings
+
+def print_progress(status):
+    print(f"   {status['staged']}/{status['total']} reports re-embedded", end='\r')
+
+if __name__ == "__main__":
+    model_name = sys.argv[1] if len(sys.argv) > 1 else EMBEDDING_MODEL
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    active_model = get_active_embedding_model()
+    if model_name == active_model:
+        print(f"✅ {model_name} is already the active embedding model")
+        sys.exit(0)
+
+    status = get_reindex_status()
+    print(f"Re-indexing from {active_model} to {model_name}...")
+    if status['target_model'] == model_name and status['staged']:
+        print(f"   Resuming with {status['staged']}/{status['total']} reports already done")
+
+    count = reindex_embeddings(model_name, batch_size, progress=print_progress)
+    if get_active_embedding_model() != model_name:
+        print("\n❌ Error: Could not load the new AI model, nothing was changed")
+        sys.exit(1)
+
+    print(f"\n✅ Success! Switched to {model_name} after re-embedding {count} report(s)")
+    print(f"   Set EMBEDDING_MODEL={model_name} so new workers start on it")
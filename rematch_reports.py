@@ -0,0 +1,31 @@
+"""
+Script to re-run matching over every unresolved Lost x Found pair and store new matches
+Usage: python rematch_reports.py [--notify] [block_size]
+
+Pairs already stored are re-scored in place. With --notify, both sides of
+every pair that has not been emailed yet are notified.
+"""
+
+import sys
+import time
+from app import MATCH_THRESHOLD, rematch_all_reports
+
+def print_progress(done, total):
+    print(f"   {done}/{total} lost reports compared", end='\r')
+
+if __name__ == "__main__":
+    notify = "--notify" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--notify"]
+    block_size = int(args[0]) if args else None
+
+    print(f"Re-matching unresolved reports (threshold {MATCH_THRESHOLD})...")
+    started = time.perf_counter()
+    result = rematch_all_reports(block_size, notify=notify, progress=print_progress)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n✅ Compared {result['lost']} lost x {result['found']} found reports in {elapsed:.1f}s")
+    print(f"   Pairs above the threshold: {result['pairs']} ({result['new']} new)")
+    if notify:
+        print(f"   Pairs notified by email: {result['notified']}")
+    elif result['new']:
+        print("   Run with --notify to email the reporters of new matches")
@@ -273,25 +273,18 @@ async function handleItemSubmit(e) {
     }
     
     const formData = new FormData(e.target);
-    const data = {
-        name: formData.get('name'),
-        contact: formData.get('contact'),
-        description: formData.get('description'),
-        status: currentReportType.charAt(0).toUpperCase() + currentReportType.slice(1),
-        secret: formData.get('secret') || ''
-    };
-    
-    // Handle image
+    const data = new FormData();
+    data.append('name', formData.get('name'));
+    data.append('contact', formData.get('contact'));
+    data.append('description', formData.get('description'));
+    data.append('status', currentReportType.charAt(0).toUpperCase() + currentReportType.slice(1));
+    data.append('secret', formData.get('secret') || '');
+    
+    // Send the image file as is, the server spools it to disk
     if (currentImageFile) {
-        const reader = new FileReader();
-        reader.onload = async function(e) {
-            data.image = e.target.result;
-            await submitReport(data);
-        };
-        reader.readAsDataURL(currentImageFile);
-    } else {
-        await submitReport(data);
+        data.append('image', currentImageFile);
     }
+    await submitReport(data);
 }
 
 // Submit Report
@@ -299,12 +292,10 @@ async function submitReport(data) {
     showLoading(true);
     
     try {
+        // multipart/form-data; the browser sets the boundary header itself
         const response = await fetch('/api/report', {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(data)
+            body: data
         });
         
         const result = await response.json();
@@ -447,6 +438,9 @@ function setupSearch() {
     });
 }
 
+// Data generation the displayed search results came from
+let searchGeneration = null;
+
 // Perform Search
 async function performSearch() {
     const searchInput = document.getElementById('search-input');
@@ -460,15 +454,11 @@ async function performSearch() {
     showLoading(true);
     
     try {
-        // Add cache-busting timestamp to ensure fresh results
-        const timestamp = new Date().getTime();
-        const response = await fetch(`/api/search?t=${timestamp}`, {
+        // The server invalidates its result cache whenever reports change
+        const response = await fetch('/api/search', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
+                'Content-Type': 'application/json'
             },
             body: JSON.stringify({ query })
         });
@@ -476,6 +466,7 @@ async function performSearch() {
         const result = await response.json();
         
         if (result.success) {
+            searchGeneration = result.generation;
             displaySearchResults(result.results);
         } else {
             showToast('error', result.message);
@@ -488,22 +479,19 @@ async function performSearch() {
     }
 }
 
-// Force refresh search results
+// Search again if reports changed since the displayed results
 async function refreshSearchResults() {
     try {
         const response = await fetch('/api/search/refresh', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
+                'Content-Type': 'application/json'
             }
         });
         
         const result = await response.json();
-        if (result.success) {
-            // Search results refreshed
+        if (result.success && searchGeneration !== null && result.generation !== searchGeneration && document.getElementById('search-input').value.trim()) {
+            performSearch();
         }
     } catch (error) {
         // Error refreshing search
@@ -542,9 +530,9 @@ function displaySearchResults(results) {
                     ${result.category ? `<p><strong>Category:</strong> ${result.category}</p>` : ''}
                     ${result.secret ? `<p><strong>Secret Detail:</strong> ${result.secret}</p>` : ''}
                 </div>
-                ${result.image ? `
+                ${result.image_url ? `
                     <div class="result-image">
-                        <img src="data:image/jpeg;base64,${result.image}" alt="Item Image">
+                        <img src="${result.thumbnail_url}" alt="Item Image" loading="lazy" onclick="showImageModal('${result.medium_url}')">
                     </div>
                 ` : ''}
             </div>
@@ -838,11 +826,26 @@ async function adminLogout() {
 
 async function loadAllReports() {
     try {
-        const response = await fetch('/api/admin/reports');
+        const [response, duplicatesResponse] = await Promise.all([
+            fetch('/api/admin/reports'),
+            fetch('/api/admin/duplicates')
+        ]);
         const result = await response.json();
+        const duplicatesResult = await duplicatesResponse.json();
+        
+        // Map each report to the other reports submitted with the same or a near-identical photo
+        const duplicates = {};
+        if (duplicatesResult.success) {
+            duplicatesResult.groups.forEach(group => {
+                const ids = group.reports.map(report => report.id);
+                ids.forEach(id => {
+                    duplicates[id] = ids.filter(other => other !== id);
+                });
+            });
+        }
         
         if (result.success) {
-            displayAdminReports(result.reports, 'All Reports');
+            displayAdminReports(result.reports, 'All Reports', duplicates);
         } else {
             showToast('error', result.message);
         }
@@ -928,10 +931,12 @@ function displayMatchedReports(reports) {
                         <i class="fas fa-bell"></i> Notify
                     </button>
                 </div>
-                ${report.image && report.image.trim() !== '' ? `
+                ${report.image_url ? `
                     <div class="report-image">
-                        <img src="data:image/jpeg;base64,${report.image}" 
-                             alt="Item Image">
+                        <a href="${report.image_url}" target="_blank" rel="noopener">
+                            <img src="${report.thumbnail_url}" loading="lazy" 
+                                 alt="Item Image">
+                        </a>
                     </div>
                 ` : ''}
             </div>
@@ -984,10 +989,12 @@ function displayResolvedReports(reports) {
                         <i class="fas fa-bell"></i> Notify
                     </button>
                 </div>
-                ${report.image && report.image.trim() !== '' ? `
+                ${report.image_url ? `
                     <div class="report-image">
-                        <img src="data:image/jpeg;base64,${report.image}" 
-                             alt="Item Image">
+                        <a href="${report.image_url}" target="_blank" rel="noopener">
+                            <img src="${report.thumbnail_url}" loading="lazy" 
+                                 alt="Item Image">
+                        </a>
                     </div>
                 ` : ''}
             </div>
@@ -998,7 +1005,7 @@ function displayResolvedReports(reports) {
     content.innerHTML = html;
 }
 
-function displayAdminReports(reports, title) {
+function displayAdminReports(reports, title, duplicates = {}) {
     const content = document.getElementById('admin-content');
     
     if (reports.length === 0) {
@@ -1030,6 +1037,7 @@ function displayAdminReports(reports, title) {
                     <p><strong>Reported:</strong> ${report.timestamp}</p>
                     <p><strong>Status:</strong> ${resolvedText} | ${matchedText}</p>
                     ${report.secret ? `<p><strong>Secret Detail:</strong> ${report.secret}</p>` : ''}
+                    ${duplicates[report.id] ? `<p style="color: #d97706;"><strong>⚠️ Possible duplicate of:</strong> ${duplicates[report.id].map(id => `#${id}`).join(', ')}</p>` : ''}
                 </div>
                 <div class="report-actions">
                     ${!report.resolved ? `<button data-report-id="${report.id}" data-report-description="${report.description.replace(/"/g, '&quot;').replace(/'/g, '&#39;')}" class="action-btn resolve-btn">
@@ -1042,10 +1050,12 @@ function displayAdminReports(reports, title) {
                         <i class="fas fa-bell"></i> Notify
                     </button>
                 </div>
-                ${report.image && report.image.trim() !== '' ? `
+                ${report.image_url ? `
                     <div class="report-image">
-                        <img src="data:image/jpeg;base64,${report.image}" 
-                             alt="Item Image">
+                        <a href="${report.image_url}" target="_blank" rel="noopener">
+                            <img src="${report.thumbnail_url}" loading="lazy" 
+                                 alt="Item Image">
+                        </a>
                     </div>
                 ` : ''}
             </div>